@@ -13,6 +13,7 @@ from pygbe.util.read_data import read_fields
 from pygbe.lspr import main
 
 from cext_wavelength_scanning import Cext_wave_scan
+from result_store import append_results
 
 #Importing data
 l_w, er_w, ei_w = numpy.loadtxt('../../data/wave_cext_d_prot_sensor/wave_water_diel_ang.txt',
@@ -43,13 +44,18 @@ field_dict_single = read_fields('../../../pygbe/examples/BSA_sensor_d=infty/sph_
 tic_single = time.time() 
 elec_field = -1
 wave_single, Cext_single = Cext_wave_scan(elec_field, wavelength, E_field_single, field_dict_single,
-                     '../../../pygbe/examples/BSA_sensor_d=infty')
+                     '../../../pygbe/examples/BSA_sensor_d=infty',
+                     checkpoint='../../data/wave_cext_d_prot_sensor/wave_cext_d_infty.checkpoint')
 toc_single = time.time()
 
 numpy.savetxt('../../data/wave_cext_d_prot_sensor/wave_cext_d_infty.txt', 
               list(zip(wave_single, Cext_single)),
               fmt = '%.1f %.8f', 
               header = 'lambda [Ang], Cext, d=infty')
+append_results('../../data/wave_cext_d_prot_sensor/results.npz',
+               wave_single, Cext_single, case='BSA_sensor_d=infty',
+               distance=numpy.inf, elec_field=elec_field,
+               material='water_silver', unit='ang')
 
 
 #Building E field for dictionary (protein)
@@ -70,13 +76,18 @@ for path in distance_path_folders:
     
     field_dict = read_fields(folder_path+'/sphere_bsa.config')
     wave, Cext = Cext_wave_scan(elec_field, wavelength, E_field, field_dict,
-                     '../../../pygbe/examples/'+path)
+                     '../../../pygbe/examples/'+path,
+                     checkpoint='../../data/wave_cext_d_prot_sensor/'+path+'.checkpoint')
     toc=time.time()
 
     numpy.savetxt('../../data/wave_cext_d_prot_sensor/'+path+'.txt', 
               list(zip(wave, Cext)),
               fmt = '%.1f %.8f', 
               header = 'lambda [Ang], Cext'+path)
+    append_results('../../data/wave_cext_d_prot_sensor/results.npz',
+                   wave, Cext, case=path,
+                   distance=float(path.split('=')[-1]), elec_field=elec_field,
+                   material='water_silver_BSA', unit='ang')
 toc_d = time.time()
 
 with open('../../data/wave_cext_d_prot_sensor/time_wave_Cext_d.txt', 'w') as f:
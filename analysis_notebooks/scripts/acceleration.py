@@ -0,0 +1,151 @@
+'''This file contains the acceleration modes of the solves. PyGBe already
+evaluates the far field with a treecode (a hierarchical multipole
+approximation of the well separated blocks) and integrates the near-singular
+close interactions with a finer quadrature; both are controlled by the .param
+file of the problem folder. An acceleration mode is a set of .param values
+meant for a kind of geometry, e.g. a large sensor with proteins at 1 nm.
+
+The modes are not validated: their values are starting points picked from the
+meaning of each .param entry, and none has been run against PyGBe yet, so
+neither their speed up, nor their accuracy, nor their memory use (e.g. whether
+a 32K sensor with several proteins fits in 64 GB) is known. Treat them as
+unvalidated until benchmark.py --acceleration passes on the case at hand.
+
+Each mode has a tolerance: the largest relative change of Cext, with respect
+to the default .param of the same problem folder, that the mode is allowed.
+benchmark.py --acceleration solves the benchmark cases with the default .param
+and with each mode, and reports the change of Cext, the speed up and whether
+the tolerance is met; it exits with an error if it is not. A mode should only
+be used on cases where that check passes.
+
+To use a mode without touching the problem folder, a shadow folder is built
+in the cache: it links every file of the problem folder except the .param
+file, which is written with the values of the mode. Shadow folders are keyed
+by folder and settings, so they are built once and reused.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+#name: values of the .param file that change (see the PyGBe documentation).
+#Unvalidated, see the module docstring.
+ACCELERATION = {
+    #finer treatment of near-singular integrals, for surfaces close together
+    'near_field': {'threshold': '0.7', 'Nk': '9', 'K_fine': '37'},
+    #cheaper far field: wider multipole acceptance and lower expansion order
+    'treecode': {'theta': '0.6', 'P': '8', 'NCRIT': '400'},
+    #large sensors (32K+) with several proteins at short distances
+    'multibody': {'theta': '0.5', 'P': '10', 'NCRIT': '300', 'BSZ': '128',
+                  'threshold': '0.7', 'Nk': '9', 'K_fine': '37'},
+}
+
+#name: largest relative change of Cext allowed with respect to the default
+#.param. These are acceptance criteria, not measured errors. near_field only tightens the near-singular integration, so it should
+#change Cext by less than the error of the default settings; treecode trades
+#accuracy for speed; multibody loosens the far field and tightens the near
+#field, where the protein-sensor coupling is.
+TOLERANCE = {
+    'near_field': 1e-3,
+    'treecode': 5e-3,
+    'multibody': 2e-3,
+}
+
+CACHE_PATH = os.path.join(os.environ.get('PYGBE_LSPR_CACHE',
+                                         os.path.join(os.path.expanduser('~'),
+                                                      '.cache', 'pygbe_lspr')),
+                          'acceleration')
+
+
+def acceleration_settings(acceleration):
+    '''Returns the .param values of an acceleration mode.
+
+    Arguments:
+    ----------
+    acceleration: str or dictionary, name of a mode in ACCELERATION or the
+                  .param values to change, e.g. {'theta': 0.4, 'P': 12}.
+
+    Returns:
+    --------
+    settings    : dictionary, .param values as strings.
+    '''
+
+    if isinstance(acceleration, str):
+        if acceleration not in ACCELERATION:
+            raise ValueError('Unknown acceleration mode {}, available modes: '
+                             '{}'.format(acceleration, ', '.join(ACCELERATION)))
+        acceleration = ACCELERATION[acceleration]
+
+    return {key: str(value) for key, value in acceleration.items()}
+
+
+def write_param(param_file, output_file, settings):
+    '''Writes a copy of a .param file with some values changed. Values that
+       are not in the original file are appended.
+    '''
+
+    with open(param_file, 'r') as f:
+        lines = f.read().splitlines()
+
+    missing = dict(settings)
+    for k, line in enumerate(lines):
+        values = line.split()
+        if values and values[0] in missing:
+            lines[k] = '{}\t{}'.format(values[0], missing.pop(values[0]))
+    lines.extend('{}\t{}'.format(key, value) for key, value in missing.items())
+
+    with open(output_file, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def accelerated_folder(example_folder_path, acceleration, cache_path=CACHE_PATH):
+    '''Returns the shadow problem folder of an acceleration mode, building it
+       the first time.
+
+    Arguments:
+    ----------
+    example_folder_path: str, path to the example folder.
+    acceleration       : str or dictionary, see acceleration_settings.
+    cache_path         : str, folder where the shadow folders are kept.
+
+    Returns:
+    --------
+    folder_path        : str, path to the shadow problem folder.
+    '''
+
+    folder = os.path.abspath(example_folder_path)
+    params = glob.glob(os.path.join(folder, '*.param'))
+    if len(params) != 1:
+        raise ValueError('{} should have one .param file, it has '
+                         '{}'.format(folder, len(params)))
+    param_file = params[0]
+
+    settings = acceleration_settings(acceleration)
+    with open(param_file, 'rb') as f:
+        key = hashlib.sha1(folder.encode() + f.read()
+                           + json.dumps(settings, sort_keys=True).encode())
+
+    folder_path = os.path.join(cache_path, '{}_{}'.format(
+                               os.path.basename(folder), key.hexdigest()[:12]))
+    if os.path.isdir(folder_path):
+        return folder_path
+
+    #build it aside and move it in place, so a half-built folder is never used
+    tmp_path = folder_path + '.{}.tmp'.format(os.getpid())
+    os.makedirs(tmp_path)
+    for name in os.listdir(folder):
+        if name.endswith('.param') or name == 'output':
+            continue
+        os.symlink(os.path.join(folder, name), os.path.join(tmp_path, name))
+    write_param(param_file, os.path.join(tmp_path, os.path.basename(param_file)),
+                settings)
+
+    try:
+        os.rename(tmp_path, folder_path)
+    except OSError:
+        #another process built it first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return folder_path
@@ -0,0 +1,380 @@
+'''This file contains the builder of sensor + protein assemblies. Instead of a
+hand-built problem folder with a translated copy of the protein mesh for each
+configuration, the assembly is built in memory from one sensor mesh, one
+protein mesh and a list of rigid transforms (distance to the sensor surface,
+direction and rotation), together with the fields of the config.
+
+PyGBe reads the geometry from the problem folder, so to solve an assembly it
+is written to a temporary folder (in memory, under /dev/shm, when available)
+that only exists during the solve. The parameter file is linked, not copied.
+
+Meshes are (vertices, faces) arrays: vertices (N, 3) float64 and faces
+(M, 3) zero-based integers, as returned by mesh_io.read_mesh. Lengths are in
+the units of the meshes (Angstrom for the BSA sensor).
+'''
+
+import contextlib
+import copy
+import os
+import shutil
+import tempfile
+import warnings
+
+import numpy
+from scipy.spatial import cKDTree
+
+from cext_wavelength_scanning import Cext_wave_scan, problem_folder
+
+#fields of the config in the order of a FIELD line (see pygbe read_fields)
+FIELD_KEYS = ['LorY', 'pot', 'E', 'kappa', 'charges', 'coulomb', 'qfile',
+              'Nparent', 'parent', 'Nchild']
+
+
+def rotation_matrix(axis, angle):
+    '''Returns the matrix of a rotation about an axis (Rodrigues' formula).
+
+    Arguments:
+    ----------
+    axis  : array (3,), axis of rotation, it does not need to be unitary.
+    angle : float, angle of rotation in degrees.
+
+    Returns:
+    --------
+    R     : array (3, 3), rotation matrix.
+    '''
+
+    u = numpy.asarray(axis, dtype=numpy.float64)
+    u = u / numpy.linalg.norm(u)
+    theta = numpy.radians(angle)
+    K = numpy.array([[0, -u[2], u[1]],
+                     [u[2], 0, -u[0]],
+                     [-u[1], u[0], 0]])
+
+    return numpy.eye(3) + numpy.sin(theta)*K + (1 - numpy.cos(theta))*K @ K
+
+
+def vertex_tree(vertices):
+    '''Returns the cKDTree of the vertices of a mesh. Repeated vertices (the
+       .vert files can have them) are removed, they slow the searches down.
+    '''
+    return cKDTree(numpy.unique(vertices, axis=0))
+
+
+def surface_tree(vertices, faces):
+    '''Builds the search structure of a triangulated surface used by
+       surface_gap: a cKDTree of its vertices, a cKDTree of the centroids of
+       its triangles and the longest edge, which bounds the distance from any
+       point of a triangle to its corners and to its centroid.
+
+    Arguments:
+    ----------
+    vertices: array (N, 3), vertices of the mesh.
+    faces   : array (M, 3), zero-based faces of the mesh.
+
+    Returns:
+    --------
+    surface : dictionary, 'vertices', 'centroids', 'triangles' (array
+              (M, 3, 3) of corners) and 'radius'.
+    '''
+
+    triangles = numpy.asarray(vertices, dtype=numpy.float64)[numpy.asarray(faces)]
+    centroids = triangles.mean(axis=1)
+    radius = numpy.linalg.norm(triangles - numpy.roll(triangles, 1, axis=1),
+                               axis=2).max()
+
+    return {'vertices': vertex_tree(vertices), 'centroids': cKDTree(centroids),
+            'triangles': triangles, 'radius': radius}
+
+
+def point_triangle_distance(points, triangles):
+    '''Distance from each point to the triangle with the same index: to its
+       plane if the projection falls inside it, to its closest edge
+       otherwise.
+
+    Arguments:
+    ----------
+    points   : array (K, 3), points.
+    triangles: array (K, 3, 3), corners of the triangles.
+
+    Returns:
+    --------
+    distance : array (K,), distance of each point to its triangle.
+    '''
+
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    ab, ac, ap = b - a, c - a, points - a
+
+    d00 = numpy.einsum('ij,ij->i', ab, ab)
+    d01 = numpy.einsum('ij,ij->i', ab, ac)
+    d11 = numpy.einsum('ij,ij->i', ac, ac)
+    d20 = numpy.einsum('ij,ij->i', ap, ab)
+    d21 = numpy.einsum('ij,ij->i', ap, ac)
+    denom = d00*d11 - d01**2
+    v = (d11*d20 - d01*d21) / denom
+    w = (d00*d21 - d01*d20) / denom
+    inside = (v >= 0) & (w >= 0) & (v + w <= 1)
+
+    normal = numpy.cross(ab, ac)
+    plane = numpy.abs(numpy.einsum('ij,ij->i', ap, normal)) \
+            / numpy.linalg.norm(normal, axis=1)
+
+    edges = []
+    for start, end in ((a, b), (b, c), (c, a)):
+        edge = end - start
+        t = numpy.clip(numpy.einsum('ij,ij->i', points - start, edge)
+                       / numpy.einsum('ij,ij->i', edge, edge), 0, 1)
+        edges.append(numpy.linalg.norm(points - start - t[:, numpy.newaxis]*edge,
+                                       axis=1))
+
+    return numpy.where(inside, plane, numpy.min(edges, axis=0))
+
+
+def surface_gap(surface, points, upper_bound=numpy.inf):
+    '''Smallest distance between a set of points (e.g. the vertices of a
+       protein) and a triangulated surface (e.g. the sensor), measured to the
+       triangles, not to their vertices, so it is exact however coarse the
+       surface is.
+
+       The nearest vertex bounds the distance to the surface from above, and
+       from below once the longest edge is subtracted, so only the points and
+       triangles that can hold the minimum are measured exactly.
+
+    Arguments:
+    ----------
+    surface    : dictionary, surface_tree of the surface.
+    points     : array (K, 3), points.
+    upper_bound: float, gaps larger than this are not searched, which is much
+                 faster; the gap is then numpy.inf.
+
+    Returns:
+    --------
+    gap        : float, smallest point to surface distance.
+    '''
+
+    radius = surface['radius']
+    nearest, _ = surface['vertices'].query(points,
+                                           distance_upper_bound=upper_bound + radius)
+    if not numpy.isfinite(nearest).any():
+        return numpy.inf
+
+    candidates = numpy.flatnonzero(nearest <= nearest.min() + radius)
+    pairs = [(i, j) for i in candidates for j in
+             surface['centroids'].query_ball_point(points[i], nearest[i] + radius)]
+    i, j = numpy.array(pairs).T
+    gap = point_triangle_distance(points[i], surface['triangles'][j]).min()
+
+    return gap if gap <= upper_bound else numpy.inf
+
+
+def place_protein(sensor, protein_vertices, distance, direction,
+                  rotation=None, sensor_tree=None, tol=1e-6, max_iter=20):
+    '''Places a protein next to the sensor: it is rotated about its centroid
+       and moved along direction, from the centroid of the sensor, until the
+       gap between both surfaces equals distance.
+
+    Arguments:
+    ----------
+    sensor          : (vertices, faces), mesh of the sensor.
+    protein_vertices: array (M, 3), vertices of the protein.
+    distance        : float, gap between the sensor and the protein surfaces,
+                      from the vertices of the protein to the triangles of
+                      the sensor (see surface_gap).
+    direction       : array (3,), direction from the sensor to the protein.
+    rotation        : (axis, angle in degrees), rotation of the protein about
+                      its centroid, None for no rotation.
+    sensor_tree     : surface_tree of the sensor, to reuse it.
+    tol             : float, tolerance of the gap.
+    max_iter        : int, maximum number of corrections of the position. If
+                      the gap is not within tol after them a warning is
+                      issued with the gap reached.
+
+    Returns:
+    --------
+    vertices        : array (M, 3), vertices of the placed protein.
+    '''
+
+    sensor_vertices = numpy.asarray(sensor[0], dtype=numpy.float64)
+    if sensor_tree is None:
+        sensor_tree = surface_tree(*sensor)
+
+    u = numpy.asarray(direction, dtype=numpy.float64)
+    u = u / numpy.linalg.norm(u)
+
+    p = protein_vertices - protein_vertices.mean(axis=0)
+    if rotation is not None:
+        p = p @ rotation_matrix(*rotation).T
+
+    #first guess: the sensor is a sphere
+    center = sensor_vertices.mean(axis=0)
+    radius = numpy.linalg.norm(sensor_vertices - center, axis=1).max()
+    shift = radius + distance - (p @ u).min()
+
+    for i in range(max_iter):
+        gap = surface_gap(sensor_tree, center + shift*u + p,
+                          upper_bound=2*distance + 1.)
+        if abs(gap - distance) <= tol:
+            break
+        #too far to measure, move closer
+        shift += distance - gap if numpy.isfinite(gap) else -distance
+    else:
+        gap = surface_gap(sensor_tree, center + shift*u + p)
+        if abs(gap - distance) > tol:
+            warnings.warn('Protein placed at a gap of {} instead of {} after '
+                          '{} iterations'.format(gap, distance, max_iter))
+
+    return center + shift*u + p
+
+
+def assembly_fields(template, n_proteins):
+    '''Builds the fields of the config of a sensor with n proteins from the
+       fields of a config with one (e.g. sphere_bsa.config, read with
+       read_fields): field 0 is the medium, field 1 the inside of the sensor
+       and field 2 the inside of the protein, which is repeated.
+
+    Arguments:
+    ----------
+    template  : dictionary, fields of the config with one protein.
+    n_proteins: int, number of proteins.
+
+    Returns:
+    --------
+    field_dict: dictionary, fields of the config with n proteins.
+    '''
+
+    fields = []
+    children = list(template['child'])
+    for i in range(len(template['Nchild'])):
+        field = {key: template[key][i] for key in FIELD_KEYS}
+        n_child = int(field['Nchild'])
+        field['child'], children = children[:n_child], children[n_child:]
+        fields.append(field)
+
+    medium, sensor, protein = fields[:3]
+    medium = dict(medium, Nchild=str(1 + n_proteins),
+                  child=[str(s) for s in range(1 + n_proteins)])
+    proteins = [dict(protein, parent=str(1 + i)) for i in range(n_proteins)]
+
+    field_dict = {key: [] for key in FIELD_KEYS + ['child']}
+    for field in [medium, sensor] + proteins:
+        for key in FIELD_KEYS:
+            field_dict[key].append(field[key])
+        field_dict['child'].extend(field['child'])
+
+    return field_dict
+
+
+def build_assembly(sensor, protein, transforms, template_fields):
+    '''Builds a sensor + proteins assembly in memory.
+
+    Arguments:
+    ----------
+    sensor         : (vertices, faces), mesh of the sensor.
+    protein        : (vertices, faces), mesh of the protein.
+    transforms     : list of dictionaries, one per protein, with 'distance'
+                     (gap to the sensor surface), 'direction' (array (3,))
+                     and optionally 'rotation' ((axis, angle in degrees)).
+    template_fields: dictionary, fields of a config with one protein (see
+                     assembly_fields).
+
+    Returns:
+    --------
+    assembly       : dictionary, 'surfaces' is the list of (name, vertices,
+                     faces), sensor first, and 'field' the fields of the
+                     config.
+    '''
+
+    sensor_vertices = numpy.asarray(sensor[0], dtype=numpy.float64)
+    protein_vertices = numpy.asarray(protein[0], dtype=numpy.float64)
+    tree = surface_tree(*sensor)
+
+    surfaces = [('sensor', sensor_vertices, numpy.asarray(sensor[1]))]
+    for i, transform in enumerate(transforms):
+        vertices = place_protein(sensor, protein_vertices,
+                                 transform['distance'], transform['direction'],
+                                 transform.get('rotation'), tree)
+        surfaces.append(('protein_{}'.format(i), vertices,
+                         numpy.asarray(protein[1])))
+
+    return {'surfaces': surfaces,
+            'field': assembly_fields(template_fields, len(transforms))}
+
+
+def write_assembly(assembly, folder_path, param_file, config_name='assembly'):
+    '''Writes an assembly as a PyGBe problem folder.
+
+    Arguments:
+    ----------
+    assembly   : dictionary, assembly from build_assembly.
+    folder_path: str, folder to write to, it must exist.
+    param_file : str, path to the .param file to use, it is linked.
+    config_name: str, name of the config file without extension.
+    '''
+
+    geometry = os.path.join(folder_path, 'geometry')
+    os.makedirs(geometry, exist_ok=True)
+
+    lines = []
+    for name, vertices, faces in assembly['surfaces']:
+        numpy.savetxt(os.path.join(geometry, name + '.vert'), vertices, fmt='%.8f')
+        numpy.savetxt(os.path.join(geometry, name + '.face'), faces + 1, fmt='%d')
+        lines.append('FILE\tgeometry/{}\tdielectric_interface'.format(name))
+
+    field = assembly['field']
+    children = list(field['child'])
+    for i in range(len(field['Nchild'])):
+        n_child = int(field['Nchild'][i])
+        values = [str(field[key][i]) for key in FIELD_KEYS] + children[:n_child]
+        children = children[n_child:]
+        lines.append('FIELD\t' + '\t'.join(values))
+
+    with open(os.path.join(folder_path, config_name + '.config'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    os.symlink(os.path.abspath(param_file),
+               os.path.join(folder_path, config_name + '.param'))
+
+
+@contextlib.contextmanager
+def assembly_folder(assembly, param_file):
+    '''Context manager that writes an assembly to a temporary problem folder,
+       in memory when /dev/shm exists, and removes it on exit. PyGBe is
+       pointed to the folder while it exists.
+
+    Yields:
+    -------
+    folder_path: str, path to the temporary problem folder.
+    '''
+
+    tmp_root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    folder_path = tempfile.mkdtemp(prefix='pygbe_assembly_', dir=tmp_root)
+    try:
+        write_assembly(assembly, folder_path, param_file)
+        with problem_folder(folder_path):
+            yield folder_path
+    finally:
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+def Cext_assembly_scan(elec_field, wavelength, diel, assembly, param_file,
+                       **kwargs):
+    '''Computes Cext of an assembly for several wavelengths.
+
+    Arguments:
+    ----------
+    elec_field: float, electric field intensity.
+    wavelength: array, wavelengths.
+    diel      : list, dielectric constants of each region for each
+                wavelength: medium, sensor and one per protein.
+    assembly  : dictionary, assembly from build_assembly.
+    param_file: str, path to the .param file.
+    kwargs    : other arguments of Cext_wave_scan (workers, checkpoint, ...).
+
+    Returns:
+    --------
+    wavelength, Cext: see Cext_wave_scan.
+    '''
+
+    with assembly_folder(assembly, param_file) as folder_path:
+        return Cext_wave_scan(elec_field, wavelength, diel,
+                              copy.deepcopy(assembly['field']), folder_path,
+                              **kwargs)
@@ -0,0 +1,276 @@
+"""
+Benchmark of the wavelength sweeps. It runs the standard cases and appends,
+for each one, the per-wavelength wall time, the setup/solve split reported by
+PyGBe, the iterations, the peak memory and the Cext values to a JSON lines
+history file, so regressions show up when the solver or the meshes change.
+
+To run it you need the corresponding problem folders in ../../../pygbe/examples,
+as for the other scripts. The mesh ladder cases use the folders
+BSA_sensor_d=1_512, BSA_sensor_d=1_2K, BSA_sensor_d=1_8K and BSA_sensor_d=1_32K.
+
+Usage:
+    python benchmark.py                      # run all the cases
+    python benchmark.py -c silver_sphere     # run some cases
+    python benchmark.py --compare            # compare the last two runs
+    python benchmark.py -c BSA_sensor_d=1 --acceleration treecode multibody
+                                             # check the acceleration modes
+    python benchmark.py -c BSA_sensor_d=1_32K --acceleration multibody \
+        --max-rss-gb 64                      # and the memory of the largest case
+
+With --acceleration each case is solved with the default .param and with
+each mode, and the relative change of Cext and the speed up of every mode are
+checked against acceleration.TOLERANCE. The peak RSS of every run is
+recorded with the ratio to the default .param, and with --max-rss-gb any run
+above that limit is reported as failed as well.
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from acceleration import ACCELERATION, TOLERANCE
+from materials import diel_list
+
+EXAMPLES_PATH = '../../../pygbe/examples/'
+HISTORY_FILE = '../../data/benchmark_history.jsonl'
+
+#name: (problem folder, config file, material of each region, unit, wavelengths)
+CASES = {
+    'silver_sphere': ('lspr_silver', 'sphereAg_complex.config',
+                      ['water_HQ72', 'silver_JC72'], 'nm',
+                      numpy.array([370., 380., 390.])),
+    'gold_sphere': ('lspr_gold', 'sphereAu_complex.config',
+                    ['water_HQ72', 'gold_JC72'], 'nm',
+                    numpy.array([510., 520., 530.])),
+    'multiple_sphere_d=1': ('multiple_sphere_d=1', 'seven_sphere_complex.config',
+                            ['water_HQ72', 'silver_JC72'] + ['BSA'] * 6, 'nm',
+                            numpy.array([380., 385., 390.])),
+    'BSA_sensor_d=infty': ('BSA_sensor_d=infty', 'sph_sensor.config',
+                           ['water_HQ72', 'silver_JC72'], 'ang',
+                           numpy.array([3830., 3845., 3860.])),
+    'BSA_sensor_d=1': ('BSA_sensor_d=1', 'sphere_bsa.config',
+                       ['water_HQ72', 'silver_JC72', 'BSA'], 'ang',
+                       numpy.array([3830., 3845., 3860.])),
+}
+
+for mesh in ['512', '2K', '8K', '32K']:
+    CASES['BSA_sensor_d=1_' + mesh] = ('BSA_sensor_d=1_' + mesh, 'sphere_bsa.config',
+                                       ['water_HQ72', 'silver_JC72', 'BSA'], 'ang',
+                                       numpy.array([3800.]))
+
+
+def read_inputs(args):
+    """
+    Parse command-line arguments to read arguments in main.
+    """
+
+    parser = ArgumentParser(description='Benchmark of the wavelength sweeps')
+    parser.add_argument('-c',
+                        '--cases',
+                        nargs='+',
+                        default=list(CASES),
+                        choices=list(CASES),
+                        help="Cases to run, all of them by default")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default=HISTORY_FILE,
+                        help="History file where results are appended")
+    parser.add_argument('--compare',
+                        action='store_true',
+                        help="Compare the last two runs of each case instead of running")
+    parser.add_argument('--acceleration',
+                        nargs='+',
+                        default=None,
+                        choices=list(ACCELERATION),
+                        help="Check these acceleration modes against the default .param")
+    parser.add_argument('--max-rss-gb',
+                        type=float,
+                        default=None,
+                        help="Fail the runs whose peak RSS is above this limit")
+
+    return parser.parse_args(args)
+
+
+def git_commit():
+    '''Returns the current commit of the repository, or None.
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(name, elec_field=-1, acceleration=None):
+    '''Runs a benchmark case. It is meant to run in a fresh process, so the
+       peak memory belongs to this case only.
+
+    Arguments:
+    ----------
+    name        : str, name of the case, one of the keys of CASES.
+    elec_field  : float, electric field intensity.
+    acceleration: str, acceleration mode (see acceleration.py), None for the
+                  default .param.
+
+    Returns:
+    --------
+    record    : dictionary, timing, memory and Cext of the case.
+    '''
+
+    from pygbe.util.read_data import read_fields
+    from cext_wavelength_scanning import Cext_wave_scan
+
+    folder, config, materials, unit, wavelength = CASES[name]
+    folder_path = EXAMPLES_PATH + folder
+    os.environ['PYGBE_PROBLEM_FOLDER'] = os.path.abspath(folder_path) + '/'
+
+    field_dict = read_fields(os.path.join(folder_path, config))
+    diel = diel_list(materials, wavelength, unit=unit)
+
+    record = {'case': name, 'acceleration': acceleration,
+              'total_elements': None, 'wavelength': [],
+              'Cext': [], 'wall_time': [], 'setup_time': [], 'solve_time': [],
+              'iterations': []}
+
+    def collect(event):
+        if event['event'] != 'after_solve':
+            return
+        results = event['results']
+        solve_time = results.get('solve_time', numpy.nan)
+        record['total_elements'] = event['total_elements']
+        record['wavelength'].append(float(event['wavelength']))
+        record['Cext'].append(float(event['Cext']))
+        record['wall_time'].append(event['wall_time'])
+        record['solve_time'].append(solve_time)
+        record['setup_time'].append(results.get('total_time', numpy.nan)
+                                    - solve_time - results.get('time_Cext', 0.))
+        record['iterations'].append(event['iterations'])
+
+    Cext_wave_scan(elec_field, wavelength, diel, field_dict, folder_path,
+                   callbacks=[collect], acceleration=acceleration)
+
+    #ru_maxrss is given in kilobytes on Linux
+    record['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+    return record
+
+
+def check_accuracy(reference, record, tolerance):
+    '''Compares a run with an acceleration mode with the run of the same case
+       with the default .param.
+
+    Arguments:
+    ----------
+    reference: dictionary, record of the run with the default .param.
+    record   : dictionary, record of the run with the acceleration mode.
+    tolerance: float, largest relative change of Cext allowed.
+
+    Returns:
+    --------
+    check    : dictionary, 'rel_err' (largest relative change of Cext over the
+               wavelengths), 'speedup' (ratio of the total wall times),
+               'rss_ratio' (ratio of the peak RSS, None if it was not
+               recorded) and 'passed' (rel_err <= tolerance).
+    '''
+
+    Cext_ref = numpy.asarray(reference['Cext'])
+    rel_err = float(numpy.max(numpy.abs(numpy.asarray(record['Cext']) - Cext_ref)
+                              / numpy.abs(Cext_ref)))
+    speedup = float(numpy.sum(reference['wall_time'])
+                    / numpy.sum(record['wall_time']))
+    rss_ratio = None
+    if reference.get('peak_rss_mb') and record.get('peak_rss_mb'):
+        rss_ratio = record['peak_rss_mb'] / reference['peak_rss_mb']
+
+    return {'rel_err': rel_err, 'speedup': speedup, 'rss_ratio': rss_ratio,
+            'passed': bool(rel_err <= tolerance)}
+
+
+def compare(history, names):
+    '''Prints the change of the mean wall time per wavelength and of Cext
+       between the last two runs of each case in the history file.
+    '''
+    with open(history, 'r') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    for name in names:
+        runs = [r for r in records if r['case'] == name
+                and r.get('acceleration') is None]
+        if len(runs) < 2:
+            print('{}: less than two runs in {}'.format(name, history))
+            continue
+        old, new = runs[-2], runs[-1]
+        t_old = numpy.mean(old['wall_time'])
+        t_new = numpy.mean(new['wall_time'])
+        dCext = numpy.max(numpy.abs(numpy.array(new['Cext']) - old['Cext'])
+                          / numpy.abs(old['Cext']))
+        print('{}: wall time per wavelength {:.2f} s -> {:.2f} s ({:+.1f}%), '
+              'peak RSS {:.0f} MB -> {:.0f} MB, max relative change of Cext '
+              '{:.2e}'.format(name, t_old, t_new, 100*(t_new/t_old - 1),
+                              old['peak_rss_mb'], new['peak_rss_mb'], dCext))
+
+
+def main(argv=sys.argv):
+    '''
+    Runs the benchmark cases, each in a fresh process, and appends one record
+    per case to the history file.
+    '''
+
+    args = read_inputs(argv[1:])
+
+    if args.compare:
+        compare(args.output, args.cases)
+        return
+
+    commit = git_commit()
+    failed = []
+    for name in args.cases:
+        reference = None
+        for acceleration in [None] + (args.acceleration or []):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                record = pool.submit(run_case, name, -1, acceleration).result()
+
+            if acceleration is not None:
+                record.update(check_accuracy(reference, record,
+                                             TOLERANCE[acceleration]))
+            record['date'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            record['commit'] = commit
+            with open(args.output, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+            if acceleration is None:
+                reference = record
+                print('{}: {:.2f} s per wavelength, peak RSS {:.0f} MB'.format(
+                      name, numpy.mean(record['wall_time']),
+                      record['peak_rss_mb']))
+            else:
+                print('{} [{}]: speed up {:.2f}, peak RSS {:.0f} MB (x{:.2f}), '
+                      'relative change of Cext {:.2e} (tolerance {:.0e}) '
+                      '{}'.format(name, acceleration, record['speedup'],
+                                  record['peak_rss_mb'], record['rss_ratio'],
+                                  record['rel_err'], TOLERANCE[acceleration],
+                                  'ok' if record['passed'] else 'FAILED'))
+                if not record['passed']:
+                    failed.append((name, acceleration))
+
+            if (args.max_rss_gb is not None
+                    and record['peak_rss_mb'] > 1024*args.max_rss_gb):
+                print('{} [{}]: peak RSS above {} GB'.format(
+                      name, acceleration or 'default', args.max_rss_gb))
+                failed.append((name, acceleration or 'default'))
+
+    if failed:
+        sys.exit('Runs out of tolerance or memory: ' + ', '.join(
+                 '{} [{}]'.format(*f) for f in failed))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
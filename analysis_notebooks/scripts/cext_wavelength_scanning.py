@@ -1,6 +1,14 @@
+import contextlib
+import copy
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy
-import pygbe 
-from pygbe.lspr import main
+
+from acceleration import accelerated_folder
+from mie_reference import Cext_analytical
 
 def create_diel_list(n_out, k_out, n_in, k_in):
     '''Returns the dielectric constant list. Each element contains the
@@ -32,13 +40,203 @@ def create_diel_list(n_out, k_out, n_in, k_in):
     return diel_out, diel_in, diel_list
 
 
-def Cext_wave_scan(elec_field, wavelength, diel, field_dict, example_folder_path):
+@contextlib.contextmanager
+def problem_folder(folder_path):
+    '''Context manager that points PyGBe to a problem folder and restores the
+       previous value of PYGBE_PROBLEM_FOLDER on exit.
+
+    Arguments:
+    ----------
+    folder_path: str, path to the problem folder.
+    '''
+
+    previous = os.environ.get('PYGBE_PROBLEM_FOLDER')
+    os.environ['PYGBE_PROBLEM_FOLDER'] = os.path.abspath(folder_path) + '/'
+    try:
+        yield folder_path
+    finally:
+        if previous is None:
+            os.environ.pop('PYGBE_PROBLEM_FOLDER', None)
+        else:
+            os.environ['PYGBE_PROBLEM_FOLDER'] = previous
+
+
+def solve_wavelength(elec_field, wave, E, field_dict, example_folder_path):
+    '''Runs PyGBe for a single wavelength and returns all its results. It
+       works on its own copy of the config dictionary, so it is safe to call
+       it from several processes at the same time.
+
+       Every call is a cold solve: pygbe.lspr.main takes no initial guess for
+       the iterative solver and does not return the surface solution, so a
+       wavelength can not be started from the solution of its neighbour.
+
+    Arguments:
+    ----------
+    elec_field         : float, electric field intensity.
+    wave               : float, wavelength we want to compute.
+    E                  : list, dielectric constant of each region for wave.
+    field_dict         : dictionary, config dictionary.
+    example_folder_path: str, path to the example folder relative to wherever
+                         the interpreter was started.
+
+    Returns:
+    --------
+    results            : dictionary, results of PyGBe, e.g. 'Cext_0',
+                         'iterations', 'total_elements', 'solve_time',
+                         'total_time'.
+    '''
+
+    #imported here so the helpers of this module (and the modules that import
+    #it) do not need PyGBe
+    from pygbe.lspr import main
+
+    field = copy.deepcopy(field_dict)
+    field['E'] = E
+    results = main(['', example_folder_path], return_results_dict=True,
+                   field=field,
+                   lspr_values=(elec_field, wave))
+
+    return results
+
+
+def Cext_wave_single(elec_field, wave, E, field_dict, example_folder_path):
+    '''Computes the extinction cross section using PyGBe for a single
+       wavelength (see solve_wavelength).
+
+    Returns:
+    --------
+    Cext               : float, cross extinction section.
+    '''
+
+    return solve_wavelength(elec_field, wave, E, field_dict,
+                            example_folder_path)['Cext_0']
+
+
+def timed_solve(elec_field, wave, E, field_dict, example_folder_path):
+    '''Runs solve_wavelength and measures its wall time.
+
+    Returns:
+    --------
+    results            : dictionary, results of PyGBe.
+    wall_time          : float, wall time of the solve in seconds.
+    '''
+
+    tic = time.time()
+    results = solve_wavelength(elec_field, wave, E, field_dict,
+                               example_folder_path)
+
+    return results, time.time() - tic
+
+
+def solve_batch(elec_field, waves, diels, field_dict, example_folder_path):
+    '''Solves several wavelengths one after the other in the same process.
+       A failed wavelength does not stop the batch. Each one is a separate
+       cold solve (see solve_wavelength), nothing is shared between them.
+
+    Arguments:
+    ----------
+    elec_field         : float, electric field intensity.
+    waves              : list, wavelengths.
+    diels              : list, dielectric constant of each region for each
+                         wavelength.
+    field_dict         : dictionary, config dictionary.
+    example_folder_path: str, path to the example folder.
+
+    Returns:
+    --------
+    outcomes           : list, for each wavelength the (results, wall_time)
+                         tuple of timed_solve, or the exception it raised.
+    '''
+
+    outcomes = []
+    for wave, E in zip(waves, diels):
+        try:
+            outcomes.append(timed_solve(elec_field, wave, E, field_dict,
+                                        example_folder_path))
+        except Exception as err:
+            outcomes.append(err)
+
+    return outcomes
+
+
+def fire(callbacks, event, **info):
+    '''Calls every callback with the event dictionary.
+    '''
+    if callbacks:
+        info['event'] = event
+        for callback in callbacks:
+            callback(info)
+
+
+def load_checkpoint(checkpoint):
+    '''Reads the (wavelength, Cext) pairs already stored in a checkpoint
+       file. A last line cut in half (e.g. the job was killed while writing
+       it) is ignored.
+
+    Arguments:
+    ----------
+    checkpoint: str, path to the checkpoint file.
+
+    Returns:
+    --------
+    done      : dictionary, maps each computed wavelength to its Cext.
+    '''
+
+    done = {}
+
+    if not os.path.exists(checkpoint):
+        return done
+
+    with open(checkpoint, 'r') as f:
+        for line in f:
+            values = line.split()
+            if (line.startswith('#') or not line.endswith('\n')
+                    or len(values) != 2):
+                continue
+            try:
+                wave, Cext = float(values[0]), float(values[1])
+            except ValueError:
+                continue
+            done[wave] = Cext
+
+    return done
+
+
+def append_checkpoint(checkpoint, wave, Cext):
+    '''Appends a (wavelength, Cext) pair to the checkpoint file and flushes
+       it to disk, so at most the solve in progress is lost if the job dies.
+
+    Arguments:
+    ----------
+    checkpoint: str, path to the checkpoint file.
+    wave      : float, wavelength.
+    Cext      : float, cross extinction section at wave.
+    '''
+
+    line = '{!r} {!r}\n'.format(float(wave), float(Cext)).encode()
+
+    with open(checkpoint, 'ab+') as f:
+        #start on a new line if a previous write was cut in half
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                line = b'\n' + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def Cext_wave_scan(elec_field, wavelength, diel, field_dict, example_folder_path,
+                   workers=None, return_errors=False, checkpoint=None,
+                   output_file=None, callbacks=None, batch_size=None,
+                   acceleration=None):
 
     '''Computes the extinction cross section using PyGBe for different 
        wavelength and associated dielectric constants. 
 
     Arguments:
     ----------
+    elec_field         : float, electric field intensity.
     wavelength         : array/list, wavelengths we want to scan.   
     diel               : list, each element contains the field('E') for the
                          respective wavelength. i.e each element is a list 
@@ -46,45 +244,150 @@ def Cext_wave_scan(elec_field, wavelength, diel, field_dict, example_folder_path
     field_dict         : dictionary, config dictionary.
     example_folder_path: str, path to the example folder relative to wherever
                          the interpreter was started. 
+    workers            : int, number of processes used to solve the
+                         wavelengths in parallel. If None (default) the
+                         wavelengths are solved serially.
+    return_errors      : bool, if True also returns the errors dictionary.
+    checkpoint         : str, path to a checkpoint file. Each result is
+                         appended to it as soon as it is computed, and
+                         wavelengths already in it are not solved again.
+    output_file        : str, if given, the (wavelength, Cext) pairs sorted
+                         by wavelength are saved there at the end of the scan.
+    callbacks          : list of functions, each one is called with an event
+                         dictionary before and after every solve (see
+                         sweep_events.py). Every event has the keys 'event'
+                         ('before_solve', 'after_solve' or 'solve_failed'),
+                         'index', 'wavelength' and 'total' (number of solves
+                         of the scan). 'after_solve' events also have 'Cext',
+                         'wall_time', 'iterations', 'residual' (None if PyGBe
+                         does not report it), 'total_elements' and 'results',
+                         the full results dictionary. 'solve_failed' events
+                         have 'error'. In parallel mode 'before_solve' fires
+                         when the wavelength is sent to the pool.
+    batch_size         : int, parallel mode only. Number of neighbouring
+                         wavelengths sent together to a worker, which solves
+                         them one after the other and returns all their
+                         results at once. Default is 1. It only saves the
+                         dispatch overhead of the pool (one task instead of
+                         batch_size), which is small next to a solve: each
+                         wavelength is still a cold pygbe.lspr.main call,
+                         with no geometry, operator or solution shared
+                         within the batch. Results reach the checkpoint when
+                         their batch finishes.
+    acceleration       : str or dictionary, acceleration mode of the solver,
+                         a name in acceleration.ACCELERATION (e.g.
+                         'multibody' for large sensors with several proteins)
+                         or the .param values to change. The problem folder
+                         is not modified, a shadow copy with the new .param
+                         file is used (see acceleration.py).
 
     Returns:
     --------  
-    Cext_wave          : list, list of cross extinction sections.   
+    wavelength         : array/list, wavelengths scanned.
+    Cext_wave          : list, list of cross extinction sections, in the same
+                         order as wavelength. In parallel mode a wavelength
+                         whose solve failed gets numpy.nan.
+    errors             : dictionary, only if return_errors is True. Maps each
+                         failed wavelength to the exception it raised.
     '''
 
-    Cext_wave = []
+    if acceleration is not None:
+        folder_path = accelerated_folder(example_folder_path, acceleration)
+        with problem_folder(folder_path):
+            return Cext_wave_scan(elec_field, wavelength, diel, field_dict,
+                                  folder_path, workers, return_errors,
+                                  checkpoint, output_file, callbacks,
+                                  batch_size)
+
+    errors = {}
     wave_diel = list(zip(wavelength, diel))
-    
-    for wave, E in wave_diel:
-        field_dict['E'] = E  
-        results = main(['', example_folder_path], return_results_dict=True,
-                       field=field_dict,
-                       lspr_values=(elec_field, wave))
-        Cext_wave.append(results['Cext_0'])
-        
+    Cext_wave = [None] * len(wave_diel)
 
-    return wavelength, Cext_wave
+    done = load_checkpoint(checkpoint) if checkpoint else {}
+    pending = []
+    for i, (wave, E) in enumerate(wave_diel):
+        if float(wave) in done:
+            Cext_wave[i] = done[float(wave)]
+        else:
+            pending.append(i)
 
+    total = len(pending)
 
-def Cext_analytical(radius, wavelength, diel_out, diel_in):
-    '''Calculates the analytical solution of the extinction cross section.
-       This solution is valid when the nano particle involved is a sphere. 
-    
-    Arguments:
-    ----------
-    radius    : float, radius of the sphere in [nm].
-    wavelength: float/array of floats, wavelength of the incident
-                electric field in [nm].
-    diel_out  : complex/array of complex, dielectric constant inside surface.
-    diel_in   : complex/array of complex, dielectric constant inside surface. 
+    def before(i):
+        fire(callbacks, 'before_solve', index=i, wavelength=wave_diel[i][0],
+             total=total)
+
+    def record(i, results, wall_time):
+        Cext_wave[i] = results['Cext_0']
+        if checkpoint:
+            append_checkpoint(checkpoint, wave_diel[i][0], Cext_wave[i])
+        fire(callbacks, 'after_solve', index=i, wavelength=wave_diel[i][0],
+             total=total, Cext=Cext_wave[i], wall_time=wall_time,
+             iterations=results.get('iterations'),
+             residual=results.get('residual'),
+             total_elements=results.get('total_elements'),
+             results=results)
+
+    def failed(i, err):
+        fire(callbacks, 'solve_failed', index=i, wavelength=wave_diel[i][0],
+             total=total, error=err)
+
+    if batch_size:
+        pending.sort(key=lambda i: wave_diel[i][0])
+
+    if workers is None:
+        for i in pending:
+            wave, E = wave_diel[i]
+            before(i)
+            try:
+                results, wall_time = timed_solve(elec_field, wave, E, field_dict,
+                                                 example_folder_path)
+            except Exception as err:
+                failed(i, err)
+                raise
+            record(i, results, wall_time)
+    else:
+        if batch_size is None:
+            batch_size = 1
+        batches = [pending[k:k + batch_size]
+                   for k in range(0, len(pending), batch_size)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for batch in batches:
+                for i in batch:
+                    before(i)
+                futures[pool.submit(solve_batch, elec_field,
+                                    [wave_diel[i][0] for i in batch],
+                                    [wave_diel[i][1] for i in batch],
+                                    field_dict, example_folder_path)] = batch
+
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    outcomes = future.result()
+                except Exception as err:
+                    outcomes = [err] * len(batch)
+
+                for i, outcome in zip(batch, outcomes):
+                    wave = wave_diel[i][0]
+                    if isinstance(outcome, Exception):
+                        Cext_wave[i] = numpy.nan
+                        errors[wave] = outcome
+                        warnings.warn('Solve failed at wavelength {}: {!r}'.format(wave, outcome))
+                        failed(i, outcome)
+                    else:
+                        record(i, *outcome)
+
+    if output_file:
+        order = numpy.argsort(wavelength, kind='stable')
+        numpy.savetxt(output_file,
+                      [(wave_diel[i][0], Cext_wave[i]) for i in order],
+                      fmt='%.8f %.8f',
+                      header='lambda, Cext')
+
+    if return_errors:
+        return wavelength, Cext_wave, errors
+
+    return wavelength, Cext_wave
 
-    Returns:
-    --------
-    Cext_an   : float/array of floats, extinction cross section.
-      
-    '''
-    wavenumber = 2*numpy.pi*numpy.sqrt(diel_out)/wavelength
-    C1 = wavenumber**2*(diel_in/diel_out-1)/(diel_in/diel_out+2)
-    Cext_an = 4*numpy.pi*radius**3/wavenumber.real * C1.imag 
-    
-    return Cext_an
@@ -0,0 +1,243 @@
+'''This file contains the Monte Carlo ensemble of protein placements. Each
+sample places n proteins at a distance d of the sensor surface, in random
+directions and with random orientations, without overlapping each other, and
+computes Cext(lambda) of the assembly. Samples are solved in parallel and the
+mean and confidence interval of Cext(lambda) and of the peak shift with
+respect to the bare sensor are updated as they finish, until the confidence
+intervals are narrow enough. Samples whose solve fails are recorded and left
+out of the statistics. Once the intervals are narrow enough, the samples still
+running are stopped: their worker processes are terminated.
+'''
+
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import warnings
+
+import numpy
+from scipy.stats import t as student_t
+
+from assembly import (build_assembly, place_protein, surface_tree, vertex_tree,
+                      Cext_assembly_scan)
+from peak_scanning import parabolic_peak
+
+
+def random_rotation(rng):
+    '''Returns a uniformly distributed random rotation as (axis, angle in
+       degrees), from a random unit quaternion.
+    '''
+    q = rng.normal(size=4)
+    q /= numpy.linalg.norm(q)
+    if q[0] < 0:
+        q = -q
+    angle = 2 * numpy.degrees(numpy.arccos(min(q[0], 1.)))
+    axis = q[1:] if numpy.linalg.norm(q[1:]) > 0 else numpy.array([0., 0., 1.])
+    return axis, angle
+
+
+def random_direction(rng):
+    '''Returns a uniformly distributed random unit vector.
+    '''
+    u = rng.normal(size=3)
+    return u / numpy.linalg.norm(u)
+
+
+def sample_transforms(rng, sensor, protein_vertices, n_proteins,
+                      distance, min_gap=None, max_tries=100, sensor_tree=None):
+    '''Samples the placement of n proteins around the sensor. A placement
+       that overlaps (or is closer than min_gap to) a protein already placed
+       is rejected and sampled again.
+
+    Arguments:
+    ----------
+    rng             : numpy.random.Generator.
+    sensor          : (vertices, faces), mesh of the sensor.
+    protein_vertices: array (M, 3), vertices of the protein.
+    n_proteins      : int, number of proteins.
+    distance        : float, gap between the sensor and each protein.
+    min_gap         : float, minimum gap between proteins, default is distance.
+    max_tries       : int, maximum number of rejected placements per protein.
+    sensor_tree     : surface_tree of the sensor, to reuse it.
+
+    Returns:
+    --------
+    transforms      : list of dictionaries, see assembly.build_assembly.
+    '''
+
+    if min_gap is None:
+        min_gap = distance
+    if sensor_tree is None:
+        sensor_tree = surface_tree(*sensor)
+
+    transforms, placed = [], []
+    for i in range(n_proteins):
+        for tries in range(max_tries):
+            transform = {'distance': distance,
+                         'direction': random_direction(rng),
+                         'rotation': random_rotation(rng)}
+            vertices = place_protein(sensor, protein_vertices,
+                                     distance, transform['direction'],
+                                     transform['rotation'], sensor_tree)
+            if all(tree.query(vertices, distance_upper_bound=min_gap)[0].min()
+                   >= min_gap for tree in placed):
+                break
+        else:
+            raise ValueError('Could not place protein {} without overlaps in '
+                             '{} tries'.format(i, max_tries))
+        transforms.append(transform)
+        placed.append(vertex_tree(vertices))
+
+    return transforms
+
+
+def grid_peak(wavelength, Cext):
+    '''Peak of a spectrum on a wavelength grid, refined with a parabola
+       through the maximum and its neighbours.
+    '''
+    i = min(max(numpy.argmax(Cext), 1), len(Cext) - 2)
+    return parabolic_peak(wavelength[i-1:i+2], Cext[i-1:i+2])[0]
+
+
+def confidence(values, level):
+    '''Mean and half width of the confidence interval of the mean (Student's
+       t) of the samples in the first axis of values.
+    '''
+    n = len(values)
+    mean = numpy.mean(values, axis=0)
+    if n < 2:
+        return mean, numpy.full_like(mean, numpy.inf)
+    half = student_t.ppf((1 + level) / 2, n - 1) \
+           * numpy.std(values, axis=0, ddof=1) / numpy.sqrt(n)
+    return mean, half
+
+
+def exit_on_sigterm():
+    '''Initializer of the worker processes. Pool.terminate sends SIGTERM, and
+       exiting through SystemExit runs the finally blocks of the solve in
+       progress, so its temporary problem folder is removed.
+    '''
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+
+def Cext_ensemble(elec_field, wavelength, diel, sensor, protein, template_fields,
+                  param_file, n_proteins, distance, min_gap=None, rel_width=0.02,
+                  shift_width=None, level=0.95, min_samples=5, max_samples=100,
+                  workers=None, seed=None):
+    '''Monte Carlo ensemble of random protein placements.
+
+    Arguments:
+    ----------
+    elec_field     : float, electric field intensity.
+    wavelength     : array, wavelengths, a grid that contains the peak.
+    diel           : list, dielectric constants of each region for each
+                     wavelength: medium, sensor and one per protein.
+    sensor         : (vertices, faces), mesh of the sensor.
+    protein        : (vertices, faces), mesh of the protein.
+    template_fields: dictionary, fields of a config with one protein (see
+                     assembly.assembly_fields).
+    param_file     : str, path to the .param file.
+    n_proteins     : int, number of proteins of each sample.
+    distance       : float, gap between the sensor and the proteins.
+    min_gap        : float, minimum gap between proteins, default is distance.
+    rel_width      : float, target half width of the confidence interval of
+                     Cext, relative to the mean (the largest over wavelength).
+    shift_width    : float, target half width of the confidence interval of
+                     the peak shift, in the units of wavelength. None to only
+                     use the target of Cext.
+    level          : float, confidence level.
+    min_samples    : int, samples solved before the targets are checked.
+    max_samples    : int, maximum number of samples.
+    workers        : int, number of processes.
+    seed           : int, seed of the random numbers.
+
+    Returns:
+    --------
+    ensemble       : dictionary with 'wavelength', 'Cext_mean', 'Cext_ci'
+                     (half width), 'shift_mean', 'shift_ci', 'Cext' (one row
+                     per sample), 'shift', 'transforms', 'Cext_sensor',
+                     'n_samples', 'converged' and 'errors', the list of
+                     (transforms, exception) of the samples that failed.
+    '''
+
+    rng = numpy.random.default_rng(seed)
+    wavelength = numpy.asarray(wavelength, dtype=numpy.float64)
+    protein_vertices = numpy.asarray(protein[0], dtype=numpy.float64)
+    tree = surface_tree(*sensor)
+
+    #bare sensor, the reference of the peak shift
+    diel_sensor = [list(E[:2]) for E in diel]
+    _, Cext_sensor = Cext_assembly_scan(elec_field, wavelength, diel_sensor,
+                                        build_assembly(sensor, protein, [],
+                                                       template_fields),
+                                        param_file)
+    Cext_sensor = numpy.asarray(Cext_sensor)
+    peak_sensor = grid_peak(wavelength, Cext_sensor)
+
+    #(transforms, result, error) of each finished sample, put by the result
+    #thread of the pool
+    finished = queue.Queue()
+
+    def submit(pool):
+        transforms = sample_transforms(rng, sensor, protein_vertices,
+                                       n_proteins, distance, min_gap,
+                                       sensor_tree=tree)
+        assembly = build_assembly(sensor, protein, transforms, template_fields)
+        pool.apply_async(Cext_assembly_scan, (elec_field, wavelength, diel,
+                                              assembly, param_file),
+                         callback=lambda result: finished.put(
+                             (transforms, result, None)),
+                         error_callback=lambda err: finished.put(
+                             (transforms, None, err)))
+
+    samples, shifts, placements, errors = [], [], [], []
+    Cext_mean = Cext_ci = shift_mean = shift_ci = None
+    converged = False
+    n_workers = workers or os.cpu_count()
+    pool = multiprocessing.Pool(n_workers, initializer=exit_on_sigterm)
+    try:
+        running = 0
+        for _ in range(min(n_workers, max_samples)):
+            submit(pool)
+            running += 1
+        submitted = running
+
+        while running:
+            transforms, result, err = finished.get()
+            running -= 1
+            if err is not None:
+                warnings.warn('Sample failed: {!r}'.format(err))
+                errors.append((transforms, err))
+            else:
+                Cext = numpy.asarray(result[1])
+                samples.append(Cext)
+                shifts.append(grid_peak(wavelength, Cext) - peak_sensor)
+                placements.append(transforms)
+
+            if samples:
+                Cext_mean, Cext_ci = confidence(numpy.array(samples), level)
+                shift_mean, shift_ci = confidence(numpy.array(shifts), level)
+            if len(samples) >= min_samples:
+                converged = numpy.max(Cext_ci / numpy.abs(Cext_mean)) <= rel_width
+                if shift_width is not None:
+                    converged = converged and shift_ci <= shift_width
+            if converged:
+                break
+
+            while submitted < max_samples and running < n_workers:
+                submit(pool)
+                running += 1
+                submitted += 1
+    finally:
+        #stop the samples still running once converged, so they do not keep
+        #the cores busy after returning
+        pool.terminate()
+        pool.join()
+
+    return {'wavelength': wavelength, 'Cext_mean': Cext_mean,
+            'Cext_ci': Cext_ci, 'shift_mean': shift_mean,
+            'shift_ci': shift_ci, 'Cext': numpy.array(samples),
+            'shift': numpy.array(shifts), 'transforms': placements,
+            'Cext_sensor': Cext_sensor, 'n_samples': len(samples),
+            'converged': bool(converged), 'errors': errors}
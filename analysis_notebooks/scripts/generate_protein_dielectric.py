@@ -25,38 +25,62 @@ def read_inputs(args):
     return parser.parse_args(args)
 
 
+#Lorentz oscillators of BSA, from Pahn, etal. 2013. Wavelengths in [nm].
+#define _1 variables
+BSA_Lambda_1 = 10853.54
+BSA_lambda_1 = 6059.8
+
+#define the rest (2-4) as an array
+BSA_Lambda_array = numpy.array([878.5, 92.6, 82.81])
+BSA_gamma_array = numpy.array([2484.52, 155.28, 65.38])
+BSA_lambda_array = numpy.array([194.1, 99.38, 57.78])
+
+
 def protein_dielectric(lamb, Lambda_1, lambda_1, Lambda_array, lambda_array, gamma_array):
-    '''Computes the value of dielectric constant of a protein for a certain
-       wavelength. It uses Lorentz oscillators, obtained from Pahn, etal. 2013
+    '''Computes the dielectric constant of a protein for an array of
+       wavelengths in one call. It uses Lorentz oscillators, obtained from
+       Pahn, etal. 2013. Any number of damped oscillators is supported, and
+       several proteins can be evaluated at once by giving the parameters of
+       each protein along the leading axis.
        
     Arguments:
     ----------
-    lamb        : float, wavelength in [nm] where we want to 
-                         know the dielectric constant.
-    Lambda_1    : float, Lorentz oscillator upper lambda 1. 
-    lambda_1    : float, Lorentz oscillator lower lambda 1.
-    Lambda_array: array of floats, Lorentz oscillator upper lambda 2,3,4.
-    lambda_array: array of floats, Lorentz oscillator lower lambda 2,3,4.
-    gamma_array : array of floats, Lorentz oscillator gamma 2,3,4.
+    lamb        : float/1D array of floats, wavelengths in [nm] where we want
+                  to know the dielectric constant.
+    Lambda_1    : float/array (P,), Lorentz oscillator upper lambda 1. 
+    lambda_1    : float/array (P,), Lorentz oscillator lower lambda 1.
+    Lambda_array: array (N,) or (P, N), Lorentz oscillator upper lambda 2,3,4...
+    lambda_array: array (N,) or (P, N), Lorentz oscillator lower lambda 2,3,4...
+    gamma_array : array (N,) or (P, N), Lorentz oscillator gamma 2,3,4...
     
     Returns:
     --------
-    epsilon: complex, dielectric constant.
+    epsilon: complex/array of complex, dielectric constant. Its shape is the
+             shape of lamb, with a leading axis of size P when the
+             parameters of P proteins are given, i.e. (L,) or (P, L).
     '''
+    lamb = numpy.asarray(lamb, dtype=numpy.float64)
+    #wavelength along the second to last axis, oscillators along the last one
+    inv_lamb = 1/numpy.atleast_1d(lamb)[:, numpy.newaxis]
+
     #Let's use the version 1/ thing so it's less confusing
-    sigma_1 = 1/Lambda_1
-    f_1 = 1/lambda_1
+    sigma_1 = 1/numpy.asarray(Lambda_1, dtype=numpy.float64)[..., numpy.newaxis]
+    f_1 = 1/numpy.asarray(lambda_1, dtype=numpy.float64)[..., numpy.newaxis]
     
-    sigma_array = 1/Lambda_array
-    alpha_array = 1/gamma_array
-    f_array = 1/lambda_array
+    sigma_array = 1/numpy.asarray(Lambda_array, dtype=numpy.float64)[..., numpy.newaxis, :]
+    alpha_array = 1/numpy.asarray(gamma_array, dtype=numpy.float64)[..., numpy.newaxis, :]
+    f_array = 1/numpy.asarray(lambda_array, dtype=numpy.float64)[..., numpy.newaxis, :]
     
-    
-    epsilon = 1 + sigma_1**2/(f_1**2 - (1/lamb**2)) + numpy.sum(
+    epsilon = 1 + sigma_1**2/(f_1**2 - inv_lamb[:, 0]**2) + numpy.sum(
                             sigma_array**2/(f_array**2 - 
-                                            1j*alpha_array/lamb 
-                                          - (1/lamb**2)))
+                                            1j*alpha_array*inv_lamb 
+                                          - inv_lamb**2), axis=-1)
     
+    if lamb.ndim == 0:
+        epsilon = epsilon[..., 0]
+        if epsilon.ndim == 0:
+            epsilon = epsilon[()]
+
     return epsilon
 
 def main(argv=sys.argv):
@@ -83,30 +107,16 @@ def main(argv=sys.argv):
     num_points = args.points
 
 
-    #define _1 variables
-    Lambda_1 = 10853.54
-    lambda_1 = 6059.8
-
-    #define the rest (2-4) as an array
-
-    Lambda_array = numpy.array([878.5, 92.6, 82.81])
-    gamma_array = numpy.array([2484.52, 155.28, 65.38])
-    lambda_array = numpy.array([194.1, 99.38, 57.78])
-
-    #Let's use the version 1/ thing so it's less confusing
-
-    sigma_array = 1/Lambda_array
-    alpha_array = 1/gamma_array
-    f_array = 1/lambda_array
-
+    Lambda_1 = BSA_Lambda_1
+    lambda_1 = BSA_lambda_1
+    Lambda_array = BSA_Lambda_array
+    gamma_array = BSA_gamma_array
+    lambda_array = BSA_lambda_array
 
     wavelength = numpy.linspace(lamb_start,lamb_end,num_points)
 
-    epsilon = numpy.zeros(len(wavelength), dtype=numpy.complex128)
-
-    for i in range(len(wavelength)):
-        epsilon[i] = protein_dielectric(wavelength[i], Lambda_1, lambda_1,
-                                     Lambda_array, lambda_array, gamma_array)
+    epsilon = protein_dielectric(wavelength, Lambda_1, lambda_1,
+                                 Lambda_array, lambda_array, gamma_array)
     
     epsilon_real = epsilon.real
     epsilon_imag = epsilon.imag
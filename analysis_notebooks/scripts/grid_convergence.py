@@ -0,0 +1,230 @@
+"""
+Grid convergence of the extinction cross section over a mesh ladder. The
+coarse meshes are solved concurrently, each in its own process, and the order
+of convergence and the Richardson extrapolation are updated as soon as three
+consecutive levels are done. The finer meshes are only solved while the
+relative error of the finest mesh so far, with respect to the Richardson
+extrapolation, is above the target.
+
+By default it runs the ladder of the convergence analysis of the paper (BSA
+sensor with a protein at d=1, wavelength of 380 nm), so it needs the problem
+folders BSA_sensor_d=1_512, BSA_sensor_d=1_2K, BSA_sensor_d=1_8K and
+BSA_sensor_d=1_32K in ../../../pygbe/examples.
+
+Usage:
+    python grid_convergence.py                 # 512 -> 32K, target 1%
+    python grid_convergence.py -t 0.005 -o ../../data/convergence_d=1.txt
+"""
+
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy
+
+from materials import diel_list
+from module_loader import load_module
+
+EXAMPLES_PATH = '../../../pygbe/examples/'
+CONVERGENCE_HELPER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  '../../paper/convergence_analysis/'
+                                  'convergence_helper.py')
+
+#(problem folder, config file), from the coarsest to the finest mesh
+LADDER = [('BSA_sensor_d=1_' + mesh, 'sphere_bsa.config')
+          for mesh in ['512', '2K', '8K', '32K']]
+
+
+def read_inputs(args):
+    """
+    Parse command-line arguments to read arguments in main.
+    """
+
+    parser = ArgumentParser(description='Grid convergence over a mesh ladder')
+    parser.add_argument('-t',
+                        '--target',
+                        type=float,
+                        default=0.01,
+                        help="Target relative error with respect to the Richardson extrapolation")
+    parser.add_argument('-w',
+                        '--wavelength',
+                        type=float,
+                        default=3800.,
+                        help="Wavelength [Ang]")
+    parser.add_argument('-r',
+                        '--rate',
+                        type=float,
+                        default=4.,
+                        help="Refinement ratio between consecutive meshes")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default=None,
+                        help="Text file where N, Cext and relative error are saved")
+
+    return parser.parse_args(args)
+
+
+def solve_level(folder_path, config, materials, unit, wavelength, elec_field=-1):
+    '''Solves one mesh of the ladder. It is meant to run in its own process,
+       as the problem folder is passed to PyGBe in the environment.
+
+    Returns:
+    --------
+    N   : int, number of elements of the mesh.
+    Cext: float, extinction cross section.
+    wall: float, wall time of the solve in seconds.
+    '''
+
+    from pygbe.util.read_data import read_fields
+    from cext_wavelength_scanning import timed_solve
+
+    os.environ['PYGBE_PROBLEM_FOLDER'] = os.path.abspath(folder_path) + '/'
+    field_dict = read_fields(os.path.join(folder_path, config))
+    E = diel_list(materials, numpy.array([wavelength]), unit=unit)[0]
+
+    results, wall = timed_solve(elec_field, wavelength, E, field_dict,
+                                folder_path)
+
+    return results['total_elements'], results['Cext_0'], wall
+
+
+def estimate(N, Cext, rate, helper):
+    '''Order of convergence, Richardson extrapolation and relative error of the
+       finest mesh, with the three finest consecutive levels solved so far.
+       Returns None for each value when there are less than three. helper
+       provides ord_convergence and richardson_extrapolation (see
+       CONVERGENCE_HELPER).
+    '''
+    if len(Cext) < 3:
+        return None, None, None
+
+    order = helper.ord_convergence(Cext, rate)
+    f_ex = helper.richardson_extrapolation(Cext)
+    rel_err = abs((Cext[-1] - f_ex)/f_ex)
+
+    return order, f_ex, rel_err
+
+
+def convergence_ladder(ladder, target, wavelength=3800., rate=4.,
+                       materials=['water_HQ72', 'silver_JC72', 'BSA'],
+                       unit='ang', concurrent=None, elec_field=-1,
+                       examples_path=EXAMPLES_PATH, helper=None):
+    '''Runs the grid convergence study.
+
+    Arguments:
+    ----------
+    ladder       : list of (folder, config file), from the coarsest mesh to the
+                   finest, with a constant refinement ratio.
+    target       : float, the finer meshes are skipped once the relative error
+                   of the finest mesh solved, with respect to the Richardson
+                   extrapolation, is below target.
+    wavelength   : float, wavelength.
+    rate         : float, refinement ratio.
+    materials    : list of str, material of each region (see materials.py).
+    unit         : str, unit of the wavelength, 'nm' or 'ang'.
+    concurrent   : int, number of coarse levels solved concurrently. Default is
+                   all but the finest one.
+    elec_field   : float, electric field intensity.
+    examples_path: str, folder that contains the problem folders.
+    helper       : module or object with ord_convergence(array, rate) and
+                   richardson_extrapolation(array). Default is the
+                   convergence_helper of the paper (see
+                   CONVERGENCE_HELPER).
+
+    Returns:
+    --------
+    study        : dictionary, with the levels solved ('levels', 'N', 'Cext',
+                   'wall_time'), the levels skipped ('skipped') and the last
+                   estimates ('order', 'richardson', 'rel_err').
+    '''
+
+    if concurrent is None:
+        concurrent = len(ladder) - 1
+    if helper is None:
+        helper = load_module(CONVERGENCE_HELPER)
+
+    done = {}
+    study = {'order': None, 'richardson': None, 'rel_err': None}
+
+    def solved():
+        '''Consecutive levels solved, starting from the coarsest.'''
+        levels = []
+        for i in range(len(ladder)):
+            if i not in done:
+                break
+            levels.append(i)
+        return levels
+
+    def update():
+        levels = solved()
+        N = numpy.array([done[i][0] for i in levels])
+        Cext = numpy.array([done[i][1] for i in levels])
+        order, f_ex, rel_err = estimate(N, Cext, rate, helper)
+        if order is not None and rel_err != study['rel_err']:
+            print('{} levels: N = {}, order = {:.2f}, Richardson = {:.6f}, '
+                  'relative error of the finest = {:.2e}'.format(
+                      len(levels), N[-1], order, f_ex, rel_err), flush=True)
+        study.update(order=order, richardson=f_ex, rel_err=rel_err)
+
+    def submit(pool, i):
+        folder, config = ladder[i]
+        return pool.submit(solve_level, examples_path + folder, config,
+                           materials, unit, wavelength, elec_field)
+
+    with ProcessPoolExecutor(max_workers=max(concurrent, 1)) as pool:
+        futures = {submit(pool, i): i for i in range(concurrent)}
+        for future in as_completed(futures):
+            i = futures[future]
+            done[i] = future.result()
+            print('{}: N = {}, Cext = {:.6f}, {:.1f} s'.format(
+                  ladder[i][0], *done[i]), flush=True)
+            update()
+
+        for i in range(concurrent, len(ladder)):
+            if study['rel_err'] is not None and study['rel_err'] <= target:
+                break
+            done[i] = submit(pool, i).result()
+            print('{}: N = {}, Cext = {:.6f}, {:.1f} s'.format(
+                  ladder[i][0], *done[i]), flush=True)
+            update()
+
+    levels = solved()
+    study['levels'] = [ladder[i][0] for i in levels]
+    study['skipped'] = [ladder[i][0] for i in range(len(levels), len(ladder))]
+    study['N'] = numpy.array([done[i][0] for i in levels])
+    study['Cext'] = numpy.array([done[i][1] for i in levels])
+    study['wall_time'] = numpy.array([done[i][2] for i in levels])
+
+    return study
+
+
+def main(argv=sys.argv):
+    '''
+    Runs the convergence study of the default ladder.
+    '''
+
+    args = read_inputs(argv[1:])
+
+    tic = time.time()
+    study = convergence_ladder(LADDER, args.target, args.wavelength, args.rate)
+    toc = time.time()
+
+    if study['skipped']:
+        print('Target {:.2e} met, skipped {}'.format(args.target,
+                                                     ', '.join(study['skipped'])))
+    print('Total time {:.1f} s'.format(toc - tic))
+
+    if args.output is not None and study['richardson'] is not None:
+        rel_err = abs((study['Cext'] - study['richardson'])/study['richardson'])
+        numpy.savetxt(args.output,
+                      numpy.column_stack((study['N'], study['Cext'], rel_err)),
+                      header='N, Cext, relative error (Richardson = {:.8f}, '
+                             'order = {:.4f})'.format(study['richardson'],
+                                                       study['order']))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,66 @@
+'''This file contains the LSPR response pipeline. It computes the shift of the
+LSPR peak when proteins are close to the sensor, locating only the peaks
+instead of computing the full spectra.
+'''
+
+from cext_wavelength_scanning import problem_folder
+from peak_scanning import Cext_wave_peak
+
+
+def lspr_peak_shift(elec_field, wavelength, sensor, proteins, tol,
+                    coarse_points=10, search_width=None, workers=None):
+    '''Computes the shift of the LSPR peak (delta lambda) of the sensor when
+       proteins are placed close to it. The peak of the bare sensor is located
+       first, and its position is used as the starting bracket for the peak
+       of every protein configuration.
+
+    Arguments:
+    ----------
+    elec_field   : float, electric field intensity.
+    wavelength   : array/list, wavelength grid where the peaks are looked for.
+    sensor       : tuple, (diel, field_dict, example_folder_path) of the bare
+                   sensor (d=infty), see Cext_wave_scan.
+    proteins     : dictionary, maps the name of each protein configuration to
+                   its (diel, field_dict, example_folder_path) tuple.
+    tol          : float, tolerance of the peak wavelengths.
+    coarse_points: int, number of wavelengths of the coarse scan of the bare
+                   sensor. The protein configurations use half of them.
+    search_width : float, half width of the bracket around the bare sensor
+                   peak where the protein peaks are looked for first. Default
+                   is 10*tol. The bracket is extended if the peak is outside.
+    workers      : int, number of processes (see Cext_wave_scan).
+
+    Returns:
+    --------
+    wave_sensor  : float, peak wavelength of the bare sensor.
+    error_sensor : float, error of wave_sensor.
+    shifts       : dictionary, maps each protein configuration name to a tuple
+                   (wave_peak, delta_lambda, error). The error is the sum of
+                   the errors of both peaks.
+    '''
+
+    if search_width is None:
+        search_width = 10 * tol
+
+    diel, field_dict, example_folder_path = sensor
+    with problem_folder(example_folder_path):
+        wave_sensor, _, error_sensor, _, _ = Cext_wave_peak(elec_field, wavelength,
+                                                            diel, field_dict,
+                                                            example_folder_path, tol,
+                                                            coarse_points=coarse_points,
+                                                            workers=workers)
+
+    bracket = (wave_sensor - search_width, wave_sensor + search_width)
+
+    shifts = {}
+    for name, (diel, field_dict, example_folder_path) in proteins.items():
+        with problem_folder(example_folder_path):
+            wave_peak, _, error, _, _ = Cext_wave_peak(elec_field, wavelength, diel,
+                                                       field_dict, example_folder_path,
+                                                       tol,
+                                                       coarse_points=max(coarse_points // 2, 3),
+                                                       bracket=bracket,
+                                                       workers=workers)
+        shifts[name] = (wave_peak, wave_peak - wave_sensor, error + error_sensor)
+
+    return wave_sensor, error_sensor, shifts
@@ -0,0 +1,188 @@
+'''This file contains the material library. It loads the refractive index
+tables of gold, silver and water and the Lorentz model of BSA once, and
+returns the dielectric constant for any wavelength array. Results are cached
+on disk, keyed by material and wavelength grid, so sweep drivers can ask for
+the dielectric constants directly instead of generating wave_*_diel*.txt files.
+'''
+
+import functools
+import hashlib
+import os
+
+import numpy
+
+from data_analysis_helper import nm_from_ev, linear_interp, spline, spline_eval
+from generate_protein_dielectric import (protein_dielectric, BSA_Lambda_1,
+                                         BSA_lambda_1, BSA_Lambda_array,
+                                         BSA_lambda_array, BSA_gamma_array)
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', '..', 'gold_silver_water_raw-data')
+
+#material: (raw data file, unit of the first column)
+TABLES = {'gold_JC72'  : ('gold_JC72.txt', 'ev'),
+          'silver_JC72': ('silver_JC72.txt', 'ev'),
+          'water_HQ72' : ('water_HQ72.txt', 'nm')}
+
+LORENTZ_MODELS = {'BSA': (BSA_Lambda_1, BSA_lambda_1, BSA_Lambda_array,
+                          BSA_lambda_array, BSA_gamma_array)}
+
+#factor that converts each unit to [nm]
+UNITS = {'nm': 1., 'ang': 0.1}
+
+CACHE_PATH = os.environ.get('PYGBE_LSPR_CACHE',
+                            os.path.join(os.path.expanduser('~'), '.cache',
+                                         'pygbe_lspr', 'dielectric'))
+CACHE_MAX_BYTES = 100 * 2**20
+
+
+@functools.lru_cache(maxsize=None)
+def load_table(material):
+    '''Loads the refractive index table of a material, with the wavelength in
+       [nm] and sorted.
+
+    Arguments:
+    ----------
+    material: str, name of the material, one of the keys of TABLES.
+
+    Returns:
+    --------
+    lamb    : array, wavelengths in [nm].
+    n       : array, real part of refractive index.
+    k       : array, imaginary part of refractive index.
+    '''
+
+    file_name, unit = TABLES[material]
+    x, n, k = numpy.loadtxt(os.path.join(RAW_DATA_PATH, file_name), unpack=True)
+
+    lamb = nm_from_ev(x) if unit == 'ev' else x * UNITS[unit]
+    order = numpy.argsort(lamb)
+
+    return lamb[order], n[order], k[order]
+
+
+def compute_dielectric(material, lamb_nm, method='linear'):
+    '''Computes the dielectric constant of a material, without using the
+       cache.
+
+    Arguments:
+    ----------
+    material: str, name of the material (see TABLES and LORENTZ_MODELS).
+    lamb_nm : array, wavelengths in [nm].
+    method  : str, interpolation of the tables, 'linear' or 'spline'.
+              Lorentz models are evaluated exactly.
+
+    Returns:
+    --------
+    diel    : array of complex, dielectric constant.
+    '''
+
+    if material in LORENTZ_MODELS:
+        return protein_dielectric(lamb_nm, *LORENTZ_MODELS[material])
+
+    if material not in TABLES:
+        raise ValueError('Unknown material {}, available materials are '
+                         '{}'.format(material, sorted(TABLES) + sorted(LORENTZ_MODELS)))
+
+    lamb, n, k = load_table(material)
+
+    if method == 'linear':
+        n_interp, k_interp = linear_interp(lamb, n, k)
+        n_range, k_range = n_interp(lamb_nm), k_interp(lamb_nm)
+    elif method == 'spline':
+        n_range, k_range = spline_eval(lamb_nm, *spline(lamb, n, k))
+    else:
+        raise ValueError('Unknown interpolation method {}'.format(method))
+
+    return (n_range + 1j*k_range)**2
+
+
+def cache_key(material, lamb_nm, method):
+    '''Returns the cache file name of a material evaluated on a wavelength grid.
+    '''
+    grid_hash = hashlib.sha1(numpy.ascontiguousarray(lamb_nm,
+                                                     dtype=numpy.float64).tobytes())
+    return '{}_{}_{}.npy'.format(material, method, grid_hash.hexdigest())
+
+
+def evict_cache(cache_path, max_bytes):
+    '''Removes the least recently used files of the cache until its size is
+       below max_bytes.
+    '''
+    entries = [os.path.join(cache_path, f) for f in os.listdir(cache_path)
+               if f.endswith('.npy')]
+    entries.sort(key=os.path.getmtime)
+
+    total = sum(os.path.getsize(f) for f in entries)
+    for f in entries:
+        if total <= max_bytes:
+            break
+        total -= os.path.getsize(f)
+        os.remove(f)
+
+
+def dielectric(material, wavelength, unit='nm', method='linear',
+               cache_path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+    '''Returns the dielectric constant of a material for a wavelength array.
+       Results are memoized on disk by (material, method, wavelength grid),
+       the least recently used ones are evicted when the cache grows larger
+       than max_bytes.
+
+    Arguments:
+    ----------
+    material  : str, 'gold_JC72', 'silver_JC72', 'water_HQ72' or 'BSA'.
+    wavelength: float/array, wavelengths.
+    unit      : str, unit of wavelength, 'nm' or 'ang'.
+    method    : str, interpolation of the tables, 'linear' or 'spline'.
+    cache_path: str, cache folder. If None the cache is not used.
+    max_bytes : int, maximum size of the cache in bytes.
+
+    Returns:
+    --------
+    diel      : array of complex, dielectric constant.
+    '''
+
+    lamb_nm = numpy.atleast_1d(numpy.asarray(wavelength, dtype=numpy.float64)) * UNITS[unit]
+
+    if cache_path is None:
+        return compute_dielectric(material, lamb_nm, method)
+
+    cache_file = os.path.join(cache_path, cache_key(material, lamb_nm, method))
+
+    if os.path.exists(cache_file):
+        os.utime(cache_file)
+        return numpy.load(cache_file)
+
+    diel = compute_dielectric(material, lamb_nm, method)
+
+    os.makedirs(cache_path, exist_ok=True)
+    tmp_file = cache_file + '.{}.tmp'.format(os.getpid())
+    with open(tmp_file, 'wb') as f:
+        numpy.save(f, diel)
+    os.replace(tmp_file, cache_file)
+    evict_cache(cache_path, max_bytes)
+
+    return diel
+
+
+def diel_list(materials, wavelength, unit='nm', method='linear'):
+    '''Returns the dielectric constant list used by Cext_wave_scan. Each element
+       contains the field('E') for the respective wavelength, i.e. the
+       dielectric constant of each region.
+
+    Arguments:
+    ----------
+    materials : list of str, material of each region, in the same order as in
+                the config file. e.g. ['water_HQ72', 'silver_JC72', 'BSA']
+    wavelength: array, wavelengths.
+    unit      : str, unit of wavelength, 'nm' or 'ang'.
+    method    : str, interpolation of the tables, 'linear' or 'spline'.
+
+    Returns:
+    --------
+    diel_list : list, dielectric constant list.
+    '''
+
+    diel = [dielectric(m, wavelength, unit=unit, method=method) for m in materials]
+
+    return [list(eps) for eps in zip(*diel)]
@@ -0,0 +1,360 @@
+"""
+Local mesh refinement of the sensor near close approaches to the proteins.
+Instead of refining the whole sphere, the triangles whose size is large
+compared with their distance to the nearest protein are split, and this is
+repeated until every triangle satisfies h <= ratio * distance. That ratio
+controls the error of the near-singular integrals and the resolution of the
+surface charge in the gap, and the mesh comes out graded: fine in the gap,
+coarse on the far side.
+
+The refined mesh is written in a copy of the problem folder, with the same
+config, so the new folder can be passed to Cext_wave_scan as is.
+
+Usage:
+    python mesh_refinement.py ../../../pygbe/examples/BSA_sensor_d=1_512 \\
+        ../../../pygbe/examples/BSA_sensor_d=1_graded -r 0.5
+"""
+
+import glob
+import os
+import shutil
+import sys
+from argparse import ArgumentParser
+
+import numpy
+from scipy.spatial import cKDTree
+
+from module_loader import load_module
+
+MESH_IO = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       '../../paper/BSA_silver_NP_LSPR_response/mesh_io.py')
+
+
+def read_mesh(mesh, mesh_io=None):
+    '''Reads a mesh with mesh_io.read_mesh (so the binary copy is used when it
+       is up to date) and merges repeated vertices, so neighbouring triangles
+       share their edges.
+
+    Arguments:
+    ----------
+    mesh    : str, path to the mesh files without the extension.
+    mesh_io : module, mesh reader, loaded from MESH_IO if None.
+
+    Returns:
+    --------
+    vertices: array (N, 3) of float64, coordinates of the vertices.
+    faces   : array (M, 3) of int, zero-based indices of the vertices.
+    '''
+
+    if mesh_io is None:
+        mesh_io = load_module(MESH_IO)
+    vertices, faces = mesh_io.read_mesh(mesh)
+
+    return weld(vertices, faces)
+
+
+def weld(vertices, faces, decimals=6):
+    '''Merges vertices that are equal up to decimals and drops the unused ones.
+    '''
+    _, index, inverse = numpy.unique(numpy.round(vertices, decimals), axis=0,
+                                     return_index=True, return_inverse=True)
+    return vertices[index], inverse.ravel()[faces]
+
+
+def write_mesh(mesh, vertices, faces):
+    '''Writes a mesh as .vert and .face text files (one-based faces).
+    '''
+    numpy.savetxt(mesh + '.vert', vertices, fmt='%.6f')
+    numpy.savetxt(mesh + '.face', faces + 1, fmt='%d')
+
+
+def element_size(vertices, faces):
+    '''Length of the longest edge of each triangle.
+    '''
+    a, b, c = (vertices[faces[:, k]] for k in range(3))
+    return numpy.max([numpy.linalg.norm(b - a, axis=1),
+                      numpy.linalg.norm(c - b, axis=1),
+                      numpy.linalg.norm(a - c, axis=1)], axis=0)
+
+
+def error_indicator(vertices, faces, sources):
+    '''Refinement indicator of each triangle, its size over its distance to
+       the nearest source surface (h/d). Near-singular integration and charge
+       resolution errors grow with it.
+
+    Arguments:
+    ----------
+    vertices: array (N, 3), vertices of the mesh.
+    faces   : array (M, 3), zero-based faces of the mesh.
+    sources : cKDTree of the vertices of the nearby surfaces (proteins).
+
+    Returns:
+    --------
+    eta     : array (M,), h/d of each triangle.
+    '''
+    centroids = vertices[faces].mean(axis=1)
+    h = element_size(vertices, faces)
+    d, _ = sources.query(centroids)
+    #distance to the closest point of the triangle, not of its centroid
+    return h / numpy.maximum(d - h / 2, 1e-12 * h)
+
+
+def refine(vertices, faces, marked, project=None, hanging=None):
+    '''Splits the marked triangles in four (red refinement), and the
+       neighbours left with one split edge in two (green closure), so the mesh
+       stays conforming. Triangles with two or more split edges are refined in
+       four as well. The orientation of the triangles is preserved.
+
+       The green triangles are placed last and returned with their parents, so
+       the next pass can merge them back (see undo_green) instead of bisecting
+       them again, which would make them skinnier with every level.
+
+    Arguments:
+    ----------
+    vertices: array (N, 3), vertices of the mesh.
+    faces   : array (M, 3), zero-based faces of the mesh.
+    marked  : array (M,) of bool, triangles to refine.
+    project : function, maps new vertices (K, 3) onto the exact surface (e.g.
+              the sphere of the sensor), None to keep them on the edges.
+    hanging : array (H, 3), (i, j, m) edges i-j that already have the vertex m
+              at their midpoint (from undo_green). They are split at m.
+
+    Returns:
+    --------
+    vertices, faces: refined mesh.
+    green          : (parents, edges), arrays (G, 3): the parent of each pair
+                     of green triangles, the last 2G faces, and its split edge
+                     as (i, j, m).
+    '''
+
+    edges = numpy.sort(numpy.stack([faces[:, [0, 1]], faces[:, [1, 2]],
+                                    faces[:, [2, 0]]], axis=1), axis=2)
+    unique, edge_id = numpy.unique(edges.reshape(-1, 2), axis=0,
+                                   return_inverse=True)
+    edge_id = edge_id.reshape(-1, 3)
+
+    split = numpy.zeros(len(unique), dtype=bool)
+    midpoint = numpy.full(len(unique), -1)
+    if hanging is not None and len(hanging):
+        lookup = {tuple(edge): k for k, edge in enumerate(unique)}
+        for i, j, m in hanging:
+            k = lookup[(min(i, j), max(i, j))]
+            split[k] = True
+            midpoint[k] = m
+
+    red = marked.copy()
+    while True:
+        split[edge_id[red].ravel()] = True
+        n_split = split[edge_id].sum(axis=1)
+        new_red = red | (n_split >= 2)
+        if (new_red == red).all():
+            break
+        red = new_red
+
+    added = split & (midpoint < 0)
+    midpoint[added] = len(vertices) + numpy.arange(added.sum())
+    new = vertices[unique[added]].mean(axis=1)
+    if project is not None:
+        new = project(new)
+    vertices = numpy.concatenate([vertices, new])
+
+    a, b, c = faces[:, 0], faces[:, 1], faces[:, 2]
+    ab, bc, ca = (midpoint[edge_id[:, k]] for k in range(3))
+
+    new_faces = [faces[n_split == 0]]
+    r = red
+    new_faces += [numpy.stack(t, axis=1)[r] for t in
+                  [(a, ab, ca), (ab, b, bc), (ca, bc, c), (ab, bc, ca)]]
+    green = (n_split == 1) & ~red
+    parents, green_edges = [], []
+    for k, (m, t1, t2, i, j) in enumerate([(ab, (a, ab, c), (ab, b, c), a, b),
+                                           (bc, (a, b, bc), (a, bc, c), b, c),
+                                           (ca, (a, b, ca), (ca, b, c), c, a)]):
+        g = green & (m >= 0)
+        #the two halves of each parent one after the other
+        new_faces.append(numpy.stack([numpy.stack(t1, axis=1)[g],
+                                      numpy.stack(t2, axis=1)[g]],
+                                     axis=1).reshape(-1, 3))
+        parents.append(faces[g])
+        green_edges.append(numpy.stack([i, j, m], axis=1)[g])
+
+    return (vertices, numpy.concatenate(new_faces),
+            (numpy.concatenate(parents), numpy.concatenate(green_edges)))
+
+
+def undo_green(faces, marked, green):
+    '''Merges the pairs of green triangles of the last pass (see refine) back
+       into their parents, the first step of a red-green refinement pass. A
+       parent is marked if either half was, and its split edge is returned as
+       hanging, so the next refine splits it at the same vertex.
+
+    Arguments:
+    ----------
+    faces : array (M, 3), zero-based faces of the mesh.
+    marked: array (M,) of bool, triangles to refine.
+    green : (parents, edges) returned by refine, None if there are none.
+
+    Returns:
+    --------
+    faces, marked, hanging: mesh, marks and hanging edges for refine.
+    '''
+
+    if green is None or not len(green[0]):
+        return faces, marked, None
+
+    parents, edges = green
+    n = len(faces) - 2*len(parents)
+    faces = numpy.concatenate([faces[:n], parents])
+    marked = numpy.concatenate([marked[:n],
+                                marked[n:].reshape(-1, 2).any(axis=1)])
+
+    return faces, marked, edges
+
+
+def sphere_projection(center, radius):
+    '''Returns a function that projects points onto a sphere.
+    '''
+    def project(points):
+        r = points - center
+        return center + radius * r / numpy.linalg.norm(r, axis=1)[:, None]
+    return project
+
+
+def graded_mesh(vertices, faces, sources, ratio=0.5, max_levels=6,
+                project=None):
+    '''Refines a mesh until h/d <= ratio for all its triangles (see
+       error_indicator), or for max_levels passes.
+
+    Arguments:
+    ----------
+    vertices  : array (N, 3), vertices of the mesh.
+    faces     : array (M, 3), zero-based faces of the mesh.
+    sources   : array (K, 3), vertices of the nearby surfaces (proteins).
+    ratio     : float, target of h/d.
+    max_levels: int, maximum number of refinement passes.
+    project   : function, see refine.
+
+    Returns:
+    --------
+    vertices, faces: graded mesh.
+    '''
+
+    tree = cKDTree(numpy.unique(sources, axis=0))
+    green = None
+    for level in range(max_levels):
+        marked = error_indicator(vertices, faces, tree) > ratio
+        if not marked.any():
+            break
+        faces, marked, hanging = undo_green(faces, marked, green)
+        vertices, faces, green = refine(vertices, faces, marked, project,
+                                        hanging)
+
+    return vertices, faces
+
+
+def config_meshes(config_file):
+    '''Returns the mesh paths (relative to the problem folder) of the FILE
+       lines of a config file, in order.
+    '''
+    meshes = []
+    with open(config_file, 'r') as f:
+        for line in f:
+            values = line.split()
+            if values and values[0] == 'FILE':
+                meshes.append(values[1])
+    return meshes
+
+
+def refine_problem_folder(folder_path, output_path, ratio=0.5, max_levels=6,
+                          sphere=True):
+    '''Writes a copy of a problem folder with the first mesh of its config (the
+       sensor) refined near the other meshes (the proteins). The config and
+       param files are copied, the other meshes are linked.
+
+    Arguments:
+    ----------
+    folder_path: str, path to the problem folder.
+    output_path: str, path to the new problem folder.
+    ratio      : float, target of h/d (see graded_mesh).
+    max_levels : int, maximum number of refinement passes.
+    sphere     : bool, if True the sensor is a sphere and the new vertices are
+                 projected onto it.
+
+    Returns:
+    --------
+    n_before   : int, number of elements of the sensor before refining.
+    n_after    : int, number of elements of the sensor after refining.
+    '''
+
+    configs = glob.glob(os.path.join(folder_path, '*.config'))
+    if len(configs) != 1:
+        raise ValueError('{} should have one .config file'.format(folder_path))
+    sensor, *proteins = config_meshes(configs[0])
+
+    mesh_io = load_module(MESH_IO)
+    vertices, faces = read_mesh(os.path.join(folder_path, sensor), mesh_io)
+    sources = numpy.concatenate([
+        mesh_io.read_mesh(os.path.join(folder_path, p))[0] for p in proteins])
+
+    project = None
+    if sphere:
+        center = vertices.mean(axis=0)
+        radius = numpy.linalg.norm(vertices - center, axis=1).mean()
+        project = sphere_projection(center, radius)
+
+    n_before = len(faces)
+    vertices, faces = graded_mesh(vertices, faces, sources, ratio, max_levels,
+                                  project)
+
+    #the sensor mesh is replaced, its binary copies (see mesh_io) as well
+    sensor_files = [os.path.normpath(sensor + '.vert'),
+                    os.path.normpath(sensor + '.face')] \
+                   + [os.path.normpath(p) for p in mesh_io.binary_paths(sensor)]
+
+    for path, _, files in os.walk(folder_path):
+        rel = os.path.relpath(path, folder_path)
+        if rel.split(os.sep)[0] == 'output':
+            continue
+        os.makedirs(os.path.join(output_path, rel), exist_ok=True)
+        for file_name in files:
+            source = os.path.join(path, file_name)
+            target = os.path.join(output_path, rel, file_name)
+            if os.path.normpath(os.path.join(rel, file_name)) in sensor_files:
+                continue
+            if file_name.endswith(('.config', '.param')):
+                shutil.copy(source, target)
+            elif not os.path.lexists(target):
+                os.symlink(os.path.abspath(source), target)
+
+    write_mesh(os.path.join(output_path, sensor), vertices, faces)
+
+    return n_before, len(faces)
+
+
+def main(argv=sys.argv):
+    '''
+    Refines the sensor mesh of a problem folder near the proteins.
+    '''
+
+    parser = ArgumentParser(description='Refine the sensor mesh near the proteins')
+    parser.add_argument('folder', type=str, help="Problem folder")
+    parser.add_argument('output', type=str, help="New problem folder")
+    parser.add_argument('-r',
+                        '--ratio',
+                        type=float,
+                        default=0.5,
+                        help="Target element size over distance to the proteins")
+    parser.add_argument('-l',
+                        '--levels',
+                        type=int,
+                        default=6,
+                        help="Maximum number of refinement passes")
+    args = parser.parse_args(argv[1:])
+
+    n_before, n_after = refine_problem_folder(args.folder, args.output,
+                                              args.ratio, args.levels)
+    print('sensor refined from {} to {} elements'.format(n_before, n_after))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
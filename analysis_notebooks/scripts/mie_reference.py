@@ -0,0 +1,266 @@
+'''This file contains the analytical reference of the extinction cross section
+of spheres and coated spheres: the quasi-static approximation and the full
+Mie series. All the functions broadcast their arguments with numpy, so radii,
+wavelengths and dielectric constants of several materials can be evaluated
+in one call, e.g. with shapes (R, 1, 1), (1, 1, L) and (1, M, L).
+
+Dielectric constants follow the convention of the rest of the scripts,
+diel = (n + 1j*k)**2 with k >= 0. The medium is taken as non absorbing in the
+Mie series (only the real part of its refractive index is used).
+'''
+
+import numpy
+
+
+def Cext_analytical(radius, wavelength, diel_out, diel_in):
+    '''Calculates the analytical solution of the extinction cross section.
+       This solution is valid when the nano particle involved is a sphere
+       (quasi-static approximation).
+
+    Arguments:
+    ----------
+    radius    : float/array, radius of the sphere in [nm].
+    wavelength: float/array of floats, wavelength of the incident
+                electric field in [nm].
+    diel_out  : complex/array of complex, dielectric constant outside surface.
+    diel_in   : complex/array of complex, dielectric constant inside surface.
+
+    Returns:
+    --------
+    Cext_an   : float/array of floats, extinction cross section.
+    '''
+    wavenumber = 2*numpy.pi*numpy.sqrt(diel_out)/wavelength
+    C1 = wavenumber**2*(diel_in/diel_out-1)/(diel_in/diel_out+2)
+    Cext_an = 4*numpy.pi*radius**3/wavenumber.real * C1.imag
+
+    return Cext_an
+
+
+def Cext_coated_analytical(radius_core, radius, wavelength, diel_out,
+                           diel_shell, diel_core):
+    '''Calculates the quasi-static extinction cross section of a coated
+       sphere, a core covered by a concentric shell (e.g. a protein layer).
+
+    Arguments:
+    ----------
+    radius_core: float/array, radius of the core in [nm].
+    radius     : float/array, outer radius of the shell in [nm].
+    wavelength : float/array, wavelength of the incident electric field in [nm].
+    diel_out   : complex/array, dielectric constant of the medium.
+    diel_shell : complex/array, dielectric constant of the shell.
+    diel_core  : complex/array, dielectric constant of the core.
+
+    Returns:
+    --------
+    Cext_an    : float/array, extinction cross section.
+    '''
+    f = (radius_core/radius)**3
+    num = (diel_shell-diel_out)*(diel_core+2*diel_shell) \
+          + f*(diel_core-diel_shell)*(diel_out+2*diel_shell)
+    den = (diel_shell+2*diel_out)*(diel_core+2*diel_shell) \
+          + f*(2*diel_shell-2*diel_out)*(diel_core-diel_shell)
+
+    wavenumber = 2*numpy.pi*numpy.sqrt(diel_out)/wavelength
+    C1 = wavenumber**2*num/den
+    Cext_an = 4*numpy.pi*radius**3/wavenumber.real * C1.imag
+
+    return Cext_an
+
+
+def n_terms(x):
+    '''Number of terms of the Mie series for size parameter x (Wiscombe).
+    '''
+    return numpy.round(x + 4*x**(1/3) + 2).astype(int)
+
+
+def Cext_mie(radius, wavelength, diel_out, diel_in):
+    '''Calculates the extinction cross section of a sphere with the full Mie
+       series (Bohren and Huffman, BHMIE).
+
+    Arguments:
+    ----------
+    radius    : float/array, radius of the sphere in [nm].
+    wavelength: float/array, wavelength of the incident electric field in [nm].
+    diel_out  : complex/array, dielectric constant outside surface.
+    diel_in   : complex/array, dielectric constant inside surface.
+
+    Returns:
+    --------
+    Cext      : float/array, extinction cross section in [nm^2].
+    '''
+    radius, wavelength, diel_out, diel_in = numpy.broadcast_arrays(
+        radius, wavelength, diel_out, diel_in)
+    shape = radius.shape
+
+    n_med = numpy.sqrt(diel_out.astype(numpy.complex128)).real.ravel()
+    k = 2*numpy.pi*n_med/wavelength.ravel()
+    x = k*radius.ravel()
+    m = numpy.sqrt(diel_in.astype(numpy.complex128)).ravel()/n_med
+    mx = m*x
+
+    nstop = n_terms(x)
+    nmax = nstop.max()
+
+    #logarithmic derivative D_n(mx), downward recurrence
+    nstart = int(max(nmax, numpy.abs(mx).max())) + 16
+    D = numpy.zeros((nmax + 1, len(x)), dtype=numpy.complex128)
+    Dn = numpy.zeros(len(x), dtype=numpy.complex128)
+    for n in range(nstart, 0, -1):
+        Dn = n/mx - 1/(Dn + n/mx)
+        if n - 1 <= nmax:
+            D[n - 1] = Dn
+
+    #Riccati-Bessel functions, upward recurrence
+    psi0, psi1 = numpy.cos(x), numpy.sin(x)
+    chi0, chi1 = -numpy.sin(x), numpy.cos(x)
+    xi1 = psi1 - 1j*chi1
+
+    Qext = numpy.zeros(len(x))
+    for n in range(1, nmax + 1):
+        psi = (2*n - 1)*psi1/x - psi0
+        chi = (2*n - 1)*chi1/x - chi0
+        xi = psi - 1j*chi
+
+        an = ((D[n]/m + n/x)*psi - psi1)/((D[n]/m + n/x)*xi - xi1)
+        bn = ((m*D[n] + n/x)*psi - psi1)/((m*D[n] + n/x)*xi - xi1)
+        Qext += numpy.where(n <= nstop, (2*n + 1)*(an.real + bn.real), 0.)
+
+        psi0, psi1 = psi1, psi
+        chi0, chi1 = chi1, chi
+        xi1 = psi1 - 1j*chi1
+
+    Cext = 2*numpy.pi/k**2*Qext
+
+    return Cext.reshape(shape) if shape else Cext[0]
+
+
+def Cext_coated_mie(radius_core, radius, wavelength, diel_out, diel_shell,
+                    diel_core):
+    '''Calculates the extinction cross section of a coated sphere with the
+       full Mie series (Bohren and Huffman, BHCOAT). Meant for small particles
+       and thin shells, as the upward recurrences of the shell functions lose
+       accuracy for large absorbing shells.
+
+    Arguments:
+    ----------
+    radius_core: float/array, radius of the core in [nm].
+    radius     : float/array, outer radius of the shell in [nm].
+    wavelength : float/array, wavelength of the incident electric field in [nm].
+    diel_out   : complex/array, dielectric constant of the medium.
+    diel_shell : complex/array, dielectric constant of the shell.
+    diel_core  : complex/array, dielectric constant of the core.
+
+    Returns:
+    --------
+    Cext       : float/array, extinction cross section in [nm^2].
+    '''
+    arrays = numpy.broadcast_arrays(radius_core, radius, wavelength, diel_out,
+                                    diel_shell, diel_core)
+    shape = arrays[0].shape
+    radius_core, radius, wavelength, diel_out, diel_shell, diel_core = \
+        [a.ravel() for a in arrays]
+
+    n_med = numpy.sqrt(diel_out.astype(numpy.complex128)).real
+    k = 2*numpy.pi*n_med/wavelength
+    x = k*radius_core
+    y = k*radius
+    m1 = numpy.sqrt(diel_core.astype(numpy.complex128))/n_med
+    m2 = numpy.sqrt(diel_shell.astype(numpy.complex128))/n_med
+    x1, x2, y2 = m1*x, m2*x, m2*y
+    refrel = m2/m1
+
+    nstop = n_terms(y)
+    nmax = nstop.max()
+
+    d0x1 = numpy.cos(x1)/numpy.sin(x1)
+    d0x2 = numpy.cos(x2)/numpy.sin(x2)
+    d0y2 = numpy.cos(y2)/numpy.sin(y2)
+    psi0y, psi1y = numpy.cos(y), numpy.sin(y)
+    chi0y, chi1y = -numpy.sin(y), numpy.cos(y)
+    xi1y = psi1y - 1j*chi1y
+    chi0y2, chi1y2 = -numpy.sin(y2), numpy.cos(y2)
+    chi0x2, chi1x2 = -numpy.sin(x2), numpy.cos(x2)
+
+    Qext = numpy.zeros(len(y))
+    for n in range(1, nmax + 1):
+        psiy = (2*n - 1)*psi1y/y - psi0y
+        chiy = (2*n - 1)*chi1y/y - chi0y
+        xiy = psiy - 1j*chiy
+        d1y2 = 1/(n/y2 - d0y2) - n/y2
+        d1x1 = 1/(n/x1 - d0x1) - n/x1
+        d1x2 = 1/(n/x2 - d0x2) - n/x2
+        chix2 = (2*n - 1)*chi1x2/x2 - chi0x2
+        chiy2 = (2*n - 1)*chi1y2/y2 - chi0y2
+        chipx2 = chi1x2 - n*chix2/x2
+        chipy2 = chi1y2 - n*chiy2/y2
+
+        ancap = (refrel*d1x1 - d1x2)/(refrel*d1x1*chix2 - chipx2) \
+                / (chix2*d1x2 - chipx2)
+        brack = ancap*(chiy2*d1y2 - chipy2)
+        bncap = (refrel*d1x2 - d1x1)/(refrel*chipx2 - d1x1*chix2) \
+                / (chix2*d1x2 - chipx2)
+        crack = bncap*(chiy2*d1y2 - chipy2)
+
+        dnbar = (d1y2 - brack*chipy2)/(1 - brack*chiy2)
+        gnbar = (d1y2 - crack*chipy2)/(1 - crack*chiy2)
+        an = ((dnbar/m2 + n/y)*psiy - psi1y)/((dnbar/m2 + n/y)*xiy - xi1y)
+        bn = ((m2*gnbar + n/y)*psiy - psi1y)/((m2*gnbar + n/y)*xiy - xi1y)
+        Qext += numpy.where(n <= nstop, (2*n + 1)*(an.real + bn.real), 0.)
+
+        psi0y, psi1y = psi1y, psiy
+        chi0y, chi1y = chi1y, chiy
+        xi1y = psi1y - 1j*chi1y
+        chi0x2, chi1x2 = chi1x2, chix2
+        chi0y2, chi1y2 = chi1y2, chiy2
+        d0x1, d0x2, d0y2 = d1x1, d1x2, d1y2
+
+    Cext = 2*numpy.pi/k**2*Qext
+
+    return Cext.reshape(shape) if shape else Cext[0]
+
+
+def Cext_reference(radius, wavelength, materials, medium='water_HQ72',
+                   unit='nm', method='mie', shell=None, thickness=0.):
+    '''Reference extinction cross section for a grid of radii, wavelengths
+       and materials, with the dielectric constants of the material library.
+
+    Arguments:
+    ----------
+    radius    : float/array, radii of the spheres in [nm] (outer radius of the
+                core when there is a shell).
+    wavelength: float/array, wavelengths.
+    materials : str/list of str, materials of the sphere (core).
+    medium    : str, material of the medium.
+    unit      : str, unit of the wavelengths, 'nm' or 'ang'.
+    method    : str, 'mie' for the full Mie series or 'quasi-static'.
+    shell     : str, material of the shell, None for bare spheres.
+    thickness : float/array, thickness of the shell in [nm].
+
+    Returns:
+    --------
+    Cext      : array, extinction cross section with shape
+                (len(radius), len(materials), len(wavelength)) in [nm^2].
+    '''
+    from materials import UNITS, dielectric
+
+    radius = numpy.atleast_1d(numpy.asarray(radius, dtype=numpy.float64))
+    wavelength = numpy.atleast_1d(numpy.asarray(wavelength, dtype=numpy.float64))
+    if isinstance(materials, str):
+        materials = [materials]
+
+    diel_core = numpy.array([dielectric(mat, wavelength, unit=unit)
+                             for mat in materials])[numpy.newaxis]
+    diel_out = dielectric(medium, wavelength, unit=unit)[numpy.newaxis,
+                                                         numpy.newaxis]
+    lamb = (wavelength*UNITS[unit])[numpy.newaxis, numpy.newaxis]
+    r = radius[:, numpy.newaxis, numpy.newaxis]
+
+    if shell is None:
+        function = {'mie': Cext_mie, 'quasi-static': Cext_analytical}[method]
+        return function(r, lamb, diel_out, diel_core)
+
+    diel_shell = dielectric(shell, wavelength, unit=unit)[numpy.newaxis,
+                                                          numpy.newaxis]
+    function = {'mie': Cext_coated_mie,
+                'quasi-static': Cext_coated_analytical}[method]
+    return function(r, r + thickness, lamb, diel_out, diel_shell, diel_core)
@@ -0,0 +1,41 @@
+"""
+Loads a module from its file, without adding its folder to sys.path. The
+analysis scripts and the paper helpers live in folders that are not packages
+of each other, and this is the one place where they load each other's files:
+the scripts load the paper helpers (e.g. mesh_io, convergence_helper), and the
+paper helpers load the scripts with scripts_module, which they get with
+runpy.run_path(...)['scripts_module'].
+"""
+
+import importlib.util
+import os
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_module(path, name=None):
+    '''Loads a module from its file.
+
+    Arguments:
+    ----------
+    path  : str, path to the .py file.
+    name  : str, name of the module, default is the file name without the
+            extension.
+
+    Returns:
+    --------
+    module: module, the module loaded.
+    '''
+
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scripts_module(name):
+    '''Loads a module of analysis_notebooks/scripts by name (see load_module).
+    '''
+    return load_module(os.path.join(SCRIPTS_PATH, name + '.py'), name)
@@ -0,0 +1,292 @@
+"""
+Parameter studies of the LSPR response. A study is declared as a dictionary:
+the axes and their values, the template of the problem folder name for each
+combination, and the bare sensor (reference) that the combinations are
+compared with. The cross product of the axes is expanded into solve tasks,
+tasks that solve the same folder (e.g. the shared d=infty sensor) are solved
+once, and the tasks are run over a pool of processes, the most expensive ones
+first. The cost of a task is estimated as the number of elements of its mesh
+times the number of wavelengths. An optional 'acceleration' entry selects the
+acceleration mode of the solver (see acceleration.py).
+
+The folder, config and materials of the combinations and of the reference are
+usually the same template for every combination. When they change with the
+value of an axis in a way a template can not express (e.g. one BSA material per
+protein), the entry is given as {axis: {value: entry}} instead.
+
+All the results of a study go to one table of the result store, one row per
+combination and wavelength, with a column for each axis, the Cext of the
+combination and the Cext of its reference (Cext_reference).
+
+The problem folders are expected in ../../../pygbe/examples, as for the other
+scripts.
+
+Usage:
+    python parameter_study.py distance
+    python parameter_study.py orientation -w 4
+    python parameter_study.py proteins
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy
+
+from materials import diel_list
+from result_store import append_results
+
+EXAMPLES_PATH = '../../../pygbe/examples/'
+STORE = '../../data/wave_cext_d_prot_sensor/studies.npz'
+
+STUDIES = {
+    'distance': {
+        'axes': {'distance': [1, 2, 4]},
+        'folder': 'BSA_sensor_d={distance}',
+        'config': 'sphere_bsa.config',
+        'materials': ['water_HQ72', 'silver_JC72', 'BSA'],
+        'reference': {'folder': 'BSA_sensor_d=infty',
+                      'config': 'sph_sensor.config',
+                      'materials': ['water_HQ72', 'silver_JC72']},
+        'wavelength': numpy.arange(3820., 3870.5, 5.),
+        'unit': 'ang',
+        'elec_field': -1},
+    'orientation': {
+        'axes': {'sensor': ['R80'], 'orientation': ['2px', '2py', '2pz']},
+        'folder': 'BSA_sensor{sensor}_{orientation}_d=1_00',
+        'config': 'sphere_bsa.config',
+        'materials': ['water_HQ72', 'silver_JC72', 'BSA', 'BSA'],
+        'reference': {'folder': 'BSA_sensor{sensor}_d=infty',
+                      'config': 'sph_sensor.config',
+                      'materials': ['water_HQ72', 'silver_JC72']},
+        'wavelength': numpy.arange(3820., 3870.1, 2.5),
+        'unit': 'ang',
+        'elec_field': 0.0037},
+    'radius': {
+        'axes': {'sensor': ['R80', 'R100', 'R125']},
+        'folder': {'sensor': {'R80': 'BSA_sensorR80_2pz_d=1_00',
+                              'R100': 'BSA_sensorR100_2prot',
+                              'R125': 'BSA_sensorR125_2pz_d=1_00'}},
+        'config': 'sphere_bsa.config',
+        'materials': ['water_HQ72', 'silver_JC72', 'BSA', 'BSA'],
+        'reference': {'folder': 'BSA_sensor{sensor}_d=infty',
+                      'config': 'sph_sensor.config',
+                      'materials': ['water_HQ72', 'silver_JC72']},
+        'wavelength': numpy.arange(3820., 3870.1, 2.5),
+        'unit': 'ang',
+        'elec_field': 0.0037},
+    'proteins': {
+        'axes': {'sensor': ['R125'], 'proteins': ['2pz', '3prot', '4prot']},
+        'folder': 'BSA_sensor{sensor}_{proteins}_d=1_00',
+        'config': 'sphere_bsa.config',
+        'materials': {'proteins': {
+            count: ['water_HQ72', 'silver_JC72'] + ['BSA'] * n
+            for count, n in [('2pz', 2), ('3prot', 3), ('4prot', 4)]}},
+        'reference': {'folder': 'BSA_sensor{sensor}_d=infty',
+                      'config': 'sph_sensor.config',
+                      'materials': ['water_HQ72', 'silver_JC72']},
+        'wavelength': numpy.arange(3820., 3870.1, 2.5),
+        'unit': 'ang',
+        'elec_field': 0.0037},
+}
+
+
+def read_inputs(args):
+    """
+    Parse command-line arguments to read arguments in main.
+    """
+
+    parser = ArgumentParser(description='Run a parameter study')
+    parser.add_argument('study',
+                        choices=list(STUDIES),
+                        help="Study to run")
+    parser.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        default=None,
+                        help="Number of processes, default is the number of CPUs")
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default=STORE,
+                        help="Result store where the study table is appended")
+
+    return parser.parse_args(args)
+
+
+def study_entry(entry, params):
+    '''Returns the value of a folder, config or materials entry of a study for
+       one combination: entry[axis][params[axis]] if it is given per value of
+       an axis, with the strings formatted with the combination parameters.
+    '''
+
+    if isinstance(entry, dict):
+        (axis, values), = entry.items()
+        entry = values[params[axis]]
+    if isinstance(entry, str):
+        return entry.format(**params)
+    return tuple(entry)
+
+
+def expand_study(spec):
+    '''Expands the cross product of the axes of a study.
+
+    Arguments:
+    ----------
+    spec        : dictionary, study specification (see STUDIES).
+
+    Returns:
+    --------
+    combinations: list of (params, task, reference task). params maps each
+                  axis to its value; a task is a (folder, config, materials)
+                  tuple, and the reference task is None if the study has no
+                  reference.
+    '''
+
+    names = list(spec['axes'])
+    combinations = []
+    for values in itertools.product(*[spec['axes'][name] for name in names]):
+        params = dict(zip(names, values))
+        task = tuple(study_entry(spec[key], params)
+                     for key in ('folder', 'config', 'materials'))
+        reference = spec.get('reference')
+        if reference is not None:
+            reference = tuple(study_entry(reference[key], params)
+                              for key in ('folder', 'config', 'materials'))
+        combinations.append((params, task, reference))
+
+    return combinations
+
+
+def estimate_elements(folder_path):
+    '''Estimates the number of elements of a problem folder as the number of
+       lines of its .face files. Returns 1 if there are none, so the tasks
+       can still be ordered by number of wavelengths.
+    '''
+
+    elements = 0
+    for path, _, files in os.walk(folder_path):
+        for file_name in files:
+            if file_name.endswith('.face'):
+                with open(os.path.join(path, file_name), 'rb') as f:
+                    elements += sum(1 for line in f if line.strip())
+
+    return max(elements, 1)
+
+
+def checkpoint_name(name, task, spec):
+    '''Returns the name of the checkpoint file of a task. It has a hash of
+       everything the results depend on (folder, config, materials,
+       wavelengths, unit, electric field and acceleration), so a checkpoint
+       written before the study spec changed is never reused.
+    '''
+
+    content = {'task': task,
+               'wavelength': numpy.asarray(spec['wavelength'],
+                                           dtype=numpy.float64).tolist(),
+               'unit': spec['unit'], 'elec_field': spec['elec_field'],
+               'acceleration': spec.get('acceleration')}
+    key = hashlib.sha1(json.dumps(content, sort_keys=True).encode())
+
+    return '{}_{}_{}.checkpoint'.format(name, task[0], key.hexdigest()[:12])
+
+
+def run_task(folder_path, config, materials, unit, wavelength, elec_field,
+             checkpoint=None, acceleration=None):
+    '''Computes Cext of a problem folder for all the wavelengths. It runs in a
+       worker process, as the problem folder is passed to PyGBe in the
+       environment.
+    '''
+
+    from pygbe.util.read_data import read_fields
+    from cext_wavelength_scanning import Cext_wave_scan, problem_folder
+
+    field_dict = read_fields(os.path.join(folder_path, config))
+    diel = diel_list(list(materials), wavelength, unit=unit)
+    with problem_folder(folder_path):
+        _, Cext = Cext_wave_scan(elec_field, wavelength, diel, field_dict,
+                                 folder_path, checkpoint=checkpoint,
+                                 acceleration=acceleration)
+
+    return numpy.asarray(Cext)
+
+
+def run_study(name, spec, store=STORE, workers=None,
+              examples_path=EXAMPLES_PATH):
+    '''Runs a parameter study and appends its table to the result store.
+
+    Arguments:
+    ----------
+    name         : str, name of the study, stored in the 'study' column.
+    spec         : dictionary, study specification (see STUDIES).
+    store        : str, path to the .npz result store.
+    workers      : int, number of processes.
+    examples_path: str, folder that contains the problem folders.
+
+    Returns:
+    --------
+    Cext         : dictionary, maps each task solved to its Cext array.
+    '''
+
+    wavelength = numpy.asarray(spec['wavelength'], dtype=numpy.float64)
+    combinations = expand_study(spec)
+
+    tasks = []
+    for _, task, reference in combinations:
+        for t in (task, reference):
+            if t is not None and t not in tasks:
+                tasks.append(t)
+
+    cost = {t: estimate_elements(examples_path + t[0]) * len(wavelength)
+            for t in tasks}
+    tasks.sort(key=lambda t: cost[t], reverse=True)
+    print('{}: {} combinations, {} solve tasks'.format(name, len(combinations),
+                                                      len(tasks)), flush=True)
+
+    checkpoint_path = os.path.dirname(store)
+    Cext = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for t in tasks:
+            checkpoint = os.path.join(checkpoint_path,
+                                      checkpoint_name(name, t, spec))
+            futures[pool.submit(run_task, examples_path + t[0], t[1], t[2],
+                                spec['unit'], wavelength,
+                                spec['elec_field'], checkpoint,
+                                spec.get('acceleration'))] = t
+        for future in as_completed(futures):
+            t = futures[future]
+            Cext[t] = future.result()
+            print('{} done'.format(t[0]), flush=True)
+
+    for params, task, reference in combinations:
+        Cext_reference = Cext[reference] if reference is not None else numpy.nan
+        append_results(store, wavelength, Cext[task], study=name, case=task[0],
+                       Cext_reference=Cext_reference,
+                       elec_field=spec['elec_field'], unit=spec['unit'],
+                       material='_'.join(task[2]), **params)
+
+    return Cext
+
+
+def main(argv=sys.argv):
+    '''
+    Runs one of the studies in STUDIES.
+    '''
+
+    args = read_inputs(argv[1:])
+
+    tic = time.time()
+    run_study(args.study, STUDIES[args.study], args.output, args.workers)
+    toc = time.time()
+
+    print('total run time: {:.1f} s'.format(toc - tic))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
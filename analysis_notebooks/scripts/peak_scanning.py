@@ -0,0 +1,148 @@
+'''This file contains functions to locate the LSPR peak, the wavelength where
+the extinction cross section is maximum, without scanning the whole
+wavelength range.
+'''
+
+import numpy
+
+from cext_wavelength_scanning import Cext_wave_scan
+
+
+def parabolic_peak(wave, Cext):
+    '''Returns the vertex of the parabola that goes through three points. It
+       is used to estimate the peak between the points of the wavelength grid.
+
+    Arguments:
+    ----------
+    wave: array of 3 floats, wavelengths (left, middle, right).
+    Cext: array of 3 floats, cross extinction sections at wave.
+
+    Returns:
+    --------
+    wave_peak: float, wavelength of the vertex, clipped to [left, right].
+    Cext_peak: float, cross extinction section at the vertex.
+    '''
+
+    x1, x2, x3 = wave
+    y1, y2, y3 = Cext
+
+    denom = (x1 - x2) * (x1 - x3) * (x2 - x3)
+    a = (x3 * (y2 - y1) + x2 * (y1 - y3) + x1 * (y3 - y2)) / denom
+    b = (x3**2 * (y1 - y2) + x2**2 * (y3 - y1) + x1**2 * (y2 - y3)) / denom
+    c = (x2 * x3 * (x2 - x3) * y1 + x3 * x1 * (x3 - x1) * y2
+         + x1 * x2 * (x1 - x2) * y3) / denom
+
+    if a >= 0:
+        return x2, y2
+
+    wave_peak = min(max(-b / (2 * a), x1), x3)
+    Cext_peak = a * wave_peak**2 + b * wave_peak + c
+
+    return wave_peak, Cext_peak
+
+
+def Cext_wave_peak(elec_field, wavelength, diel, field_dict, example_folder_path,
+                   tol, coarse_points=10, bracket=None, workers=None,
+                   checkpoint=None):
+    '''Locates the wavelength where the extinction cross section is maximum.
+       It starts with a coarse scan, brackets the maximum and then bisects
+       both sides of the bracket until the peak is known within tol. Only
+       wavelengths of the given grid are solved, so diel is not interpolated.
+
+    Arguments:
+    ----------
+    elec_field         : float, electric field intensity.
+    wavelength         : array/list, wavelength grid where the peak is looked
+                         for (the fine grid we would scan otherwise).
+    diel               : list, each element contains the field('E') for the
+                         respective wavelength. i.e each element is a list
+                         of the dielectric constant of each region.
+    field_dict         : dictionary, config dictionary.
+    example_folder_path: str, path to the example folder relative to wherever
+                         the interpreter was started.
+    tol                : float, tolerance of the peak wavelength, same units
+                         as wavelength.
+    coarse_points      : int, number of wavelengths of the first scan.
+    bracket            : tuple, (start, end) wavelengths where the coarse scan
+                         is done. If None the whole grid is used. If the
+                         maximum lies outside, the bracket is extended.
+    workers            : int, number of processes (see Cext_wave_scan).
+    checkpoint         : str, path to a checkpoint file (see Cext_wave_scan).
+
+    Returns:
+    --------
+    wave_peak          : float, wavelength of the peak.
+    Cext_peak          : float, cross extinction section at the peak.
+    wave_error         : float, half width of the final bracket, the peak
+                         wavelength is within wave_peak +/- wave_error.
+    wave_eval          : array, wavelengths solved, sorted.
+    Cext_eval          : array, cross extinction sections at wave_eval.
+    '''
+
+    wavelength = numpy.asarray(wavelength, dtype=float)
+    order = numpy.argsort(wavelength, kind='stable')
+    wave = wavelength[order]
+    diel_sorted = [diel[i] for i in order]
+    last = len(wave) - 1
+
+    evaluated = {}
+
+    def evaluate(indices):
+        indices = sorted(set(int(i) for i in indices) - set(evaluated))
+        if indices:
+            _, Cext = Cext_wave_scan(elec_field, wave[indices],
+                                     [diel_sorted[i] for i in indices],
+                                     field_dict, example_folder_path,
+                                     workers=workers, checkpoint=checkpoint)
+            evaluated.update(zip(indices, Cext))
+
+    if bracket is None:
+        start, end = 0, last
+    else:
+        start = min(int(numpy.searchsorted(wave, min(bracket))), last)
+        end = max(int(numpy.searchsorted(wave, max(bracket), side='right')) - 1,
+                  start)
+
+    evaluate(numpy.linspace(start, end, max(coarse_points, 3)).round())
+
+    while True:
+        idx = sorted(evaluated)
+        k = int(numpy.nanargmax([evaluated[i] for i in idx]))
+
+        #The maximum is at an edge of what we solved, extend the scan outwards
+        if k == 0 and idx[0] > 0:
+            step = idx[1] - idx[0] if len(idx) > 1 else 1
+            evaluate([max(idx[0] - step, 0)])
+            continue
+        if k == len(idx) - 1 and idx[-1] < last:
+            step = idx[-1] - idx[-2] if len(idx) > 1 else 1
+            evaluate([min(idx[-1] + step, last)])
+            continue
+
+        left = idx[max(k - 1, 0)]
+        mid = idx[k]
+        right = idx[min(k + 1, len(idx) - 1)]
+
+        if (wave[right] - wave[left]) / 2 <= tol:
+            break
+
+        new = [i for i in ((left + mid) // 2, (mid + right + 1) // 2)
+               if i not in evaluated]
+        if not new:
+            #The grid can not resolve the peak any better
+            break
+        evaluate(new)
+
+    wave_error = (wave[right] - wave[left]) / 2
+
+    if left < mid < right:
+        wave_peak, Cext_peak = parabolic_peak(wave[[left, mid, right]],
+                                              [evaluated[left], evaluated[mid],
+                                               evaluated[right]])
+    else:
+        wave_peak, Cext_peak = wave[mid], evaluated[mid]
+
+    wave_eval = wave[idx]
+    Cext_eval = numpy.array([evaluated[i] for i in idx])
+
+    return wave_peak, Cext_peak, wave_error, wave_eval, Cext_eval
@@ -0,0 +1,50 @@
+"""
+Computes the LSPR peak shift of the BSA sensor for the same cases as
+Cext_wave_dist_prot_sensor.py, without computing the full spectra. It needs the
+same problem folders: BSA_sensor_d=1, BSA_sensor_d=2, BSA_sensor_d=4 and for
+the case of no protein BSA_sensor_d=infty.
+"""
+
+import numpy
+import time
+
+from pygbe.util.read_data import read_fields
+
+from lspr_response import lspr_peak_shift
+from materials import diel_list
+
+#The peak search only solves a few wavelengths, so we can afford a fine grid.
+#Dielectric constants come from the material library.
+wavelength = numpy.arange(3820., 3870.25, 0.5) #[Ang]
+
+E_field_single = diel_list(['water_HQ72', 'silver_JC72'], wavelength, unit='ang')
+E_field = diel_list(['water_HQ72', 'silver_JC72', 'BSA'], wavelength, unit='ang')
+
+sensor = (E_field_single,
+          read_fields('../../../pygbe/examples/BSA_sensor_d=infty/sph_sensor.config'),
+          '../../../pygbe/examples/BSA_sensor_d=infty')
+
+distance_path_folders = ['BSA_sensor_d=1',
+                         'BSA_sensor_d=2',
+                         'BSA_sensor_d=4']
+
+proteins = {}
+for path in distance_path_folders:
+    folder_path = '../../../pygbe/examples/' + path
+    proteins[path] = (E_field, read_fields(folder_path+'/sphere_bsa.config'),
+                      folder_path)
+
+tic = time.time()
+elec_field = -1
+tol = 1. #[Ang]
+wave_sensor, error_sensor, shifts = lspr_peak_shift(elec_field, wavelength,
+                                                    sensor, proteins, tol)
+toc = time.time()
+
+with open('../../data/wave_cext_d_prot_sensor/peak_shift_d.txt', 'w') as f:
+    print('# case, peak [Ang], delta lambda [Ang], error [Ang]', file=f)
+    print('BSA_sensor_d=infty {:.4f} {:.4f} {:.4f}'.format(wave_sensor, 0.,
+                                                           error_sensor), file=f)
+    for path in distance_path_folders:
+        print('{} {:.4f} {:.4f} {:.4f}'.format(path, *shifts[path]), file=f)
+    print('# total run time: {}'.format(toc-tic), file=f)
@@ -0,0 +1,230 @@
+'''This file contains the first order (Born) estimate of the change of the
+extinction cross section, and of the peak shift, caused by proteins next to a
+spherical sensor. The protein is a weak dielectric perturbation of the medium,
+so by reciprocity the change of the polarizability of the system is
+
+    delta_alpha = (diel_protein/diel_out - 1) * integral over the protein of
+                  E(r).E(r) dV
+
+where E is the (vector) field around the bare sensor for a unit incident
+field along the polarization e, and E.E = sum_i E_i**2 (no complex
+conjugate). Both the component of E along e and the transverse one, the
+3*beta*a**3*cos*sin/r**3 term of the dipole of the sensor, contribute. The
+field is the quasi-static one of a sphere (incident field plus the dipole of
+the sensor), and the volume integral is done on the protein mesh.
+
+The estimate is added to the spectrum of the bare sensor computed with PyGBe,
+so each placement costs a volume quadrature and no solve.
+
+All lengths, including the wavelength, are in the units of the meshes; the
+change of Cext is scaled with area_scale to the units of the bare sensor
+spectrum (e.g. 0.01 from Angstrom^2 to nm^2).
+'''
+
+import numpy
+
+from assembly import place_protein, surface_tree
+from ensemble import grid_peak
+
+#4 point, degree 2 quadrature of a tetrahedron (barycentric coordinates)
+TET_A = 0.5854101966249685
+TET_B = 0.1381966011250105
+TET_POINTS = numpy.array([[TET_A, TET_B, TET_B, TET_B],
+                          [TET_B, TET_A, TET_B, TET_B],
+                          [TET_B, TET_B, TET_A, TET_B],
+                          [TET_B, TET_B, TET_B, TET_A]])
+
+
+def volume_quadrature(vertices, faces):
+    '''Quadrature points and weights of the volume enclosed by a closed
+       triangular mesh. The volume is split in the tetrahedra formed by each
+       triangle and the centroid; their signed volumes make the rule exact for
+       any closed surface, convex or not.
+
+    Arguments:
+    ----------
+    vertices: array (N, 3), vertices of the mesh.
+    faces   : array (M, 3), zero-based indices of the vertices of each triangle.
+
+    Returns:
+    --------
+    points  : array (4M, 3), quadrature points.
+    weights : array (4M,), quadrature weights, they add up to the volume.
+    '''
+
+    c = vertices.mean(axis=0)
+    a, b, d = (vertices[faces[:, k]] for k in range(3))
+    volume = numpy.einsum('ij,ij->i', a - c, numpy.cross(b - c, d - c)) / 6
+    if volume.sum() < 0:
+        volume = -volume
+
+    corners = numpy.stack([numpy.broadcast_to(c, a.shape), a, b, d], axis=1)
+    points = numpy.einsum('qk,mkj->mqj', TET_POINTS, corners).reshape(-1, 3)
+    weights = numpy.repeat(volume / 4, 4)
+
+    return points, weights
+
+
+def sensor_field(points, center, radius, diel_out, diel_sensor, polarization):
+    '''Quasi-static field around a sphere for a unit incident field,
+
+           E = e + beta*a**3 * (3*r_hat*(r_hat.e) - e) / r**3,
+           beta = (diel_sensor - diel_out)/(diel_sensor + 2*diel_out).
+
+    Arguments:
+    ----------
+    points      : array (N, 3), points outside the sphere.
+    center      : array (3,), center of the sphere.
+    radius      : float, radius of the sphere.
+    diel_out    : complex/array (L,), dielectric constant of the medium.
+    diel_sensor : complex/array (L,), dielectric constant of the sphere.
+    polarization: array (3,), unit vector of the incident field.
+
+    Returns:
+    --------
+    E           : array (N, 3, L), field at each point and wavelength.
+    '''
+
+    r = points - center
+    dist = numpy.linalg.norm(r, axis=1)
+    r_hat = r / dist[:, numpy.newaxis]
+    cos = r_hat @ polarization
+    beta = numpy.atleast_1d(diel_sensor - diel_out) \
+           / numpy.atleast_1d(diel_sensor + 2*diel_out)
+
+    dipole = radius**3 * (3*r_hat*cos[:, numpy.newaxis] - polarization) \
+             / dist[:, numpy.newaxis]**3
+
+    return polarization[:, numpy.newaxis] \
+           + dipole[:, :, numpy.newaxis] * beta[numpy.newaxis, numpy.newaxis]
+
+
+def delta_Cext(wavelength, diel, center, radius, protein_meshes,
+               polarization=(0, 0, 1), area_scale=1.):
+    '''First order change of Cext due to proteins next to a spherical sensor.
+
+    Arguments:
+    ----------
+    wavelength    : array (L,), wavelengths, in the units of the meshes.
+    diel          : array (L, 2 + P), dielectric constants of the medium, the
+                    sensor and each protein for each wavelength.
+    center        : array (3,), center of the sensor.
+    radius        : float, radius of the sensor.
+    protein_meshes: list of (vertices, faces) of the placed proteins, closed
+                    and outside the sensor (see volume_quadrature).
+    polarization  : array (3,), direction of the incident field, it has to
+                    be the one of the solver.
+    area_scale    : float, factor from mesh units squared to the units of Cext.
+
+    Returns:
+    --------
+    dCext         : array (L,), change of Cext.
+    indicator     : array (L,), |delta_alpha| / |alpha of the sensor|. The first
+                    order estimate is only reliable when it is small.
+    '''
+
+    wavelength = numpy.asarray(wavelength, dtype=numpy.float64)
+    diel = numpy.asarray(diel, dtype=numpy.complex128)
+    e = numpy.asarray(polarization, dtype=numpy.float64)
+    e = e / numpy.linalg.norm(e)
+    diel_out, diel_sensor = diel[:, 0], diel[:, 1]
+
+    d_alpha = numpy.zeros(len(wavelength), dtype=numpy.complex128)
+    for p, (vertices, faces) in enumerate(protein_meshes):
+        points, weights = volume_quadrature(numpy.asarray(vertices),
+                                            numpy.asarray(faces))
+        E = sensor_field(points, center, radius, diel_out, diel_sensor, e)
+        d_alpha += (diel[:, 2 + p]/diel_out - 1) \
+                   * numpy.einsum('n,nil->l', weights, E**2)
+
+    alpha = 4*numpy.pi*radius**3 * (diel_sensor - diel_out) \
+            / (diel_sensor + 2*diel_out)
+    wavenumber = 2*numpy.pi*numpy.sqrt(diel_out).real / wavelength
+
+    dCext = area_scale * wavenumber * d_alpha.imag
+    indicator = numpy.abs(d_alpha) / numpy.abs(alpha)
+
+    return dCext, indicator
+
+
+def peak_shift_estimate(wavelength, Cext_sensor, diel, sensor_vertices,
+                        protein_meshes, polarization=(0, 0, 1), area_scale=1.,
+                        max_indicator=0.1):
+    '''Estimates the spectrum and the peak shift of the sensor with proteins
+       from the spectrum of the bare sensor.
+
+    Arguments:
+    ----------
+    wavelength     : array (L,), wavelengths (a grid that contains the peak),
+                     in the units of the meshes.
+    Cext_sensor    : array (L,), Cext of the bare sensor (d=infty), e.g. from
+                     Cext_wave_scan.
+    diel           : array (L, 2 + P), see delta_Cext.
+    sensor_vertices: array (N, 3), vertices of the sensor, used for its center
+                     and radius.
+    protein_meshes : list of (vertices, faces) of the placed proteins.
+    polarization   : array (3,), direction of the incident field.
+    area_scale     : float, see delta_Cext.
+    max_indicator  : float, above this value of the indicator the estimate is
+                     flagged as not valid and a full solve is recommended.
+
+    Returns:
+    --------
+    Cext           : array (L,), estimated Cext with the proteins.
+    shift          : float, estimated peak shift.
+    indicator      : float, largest value of the validity indicator.
+    valid          : bool, True if indicator <= max_indicator.
+    '''
+
+    wavelength = numpy.asarray(wavelength, dtype=numpy.float64)
+    Cext_sensor = numpy.asarray(Cext_sensor, dtype=numpy.float64)
+    center = sensor_vertices.mean(axis=0)
+    radius = numpy.linalg.norm(sensor_vertices - center, axis=1).mean()
+
+    dCext, indicator = delta_Cext(wavelength, diel, center, radius,
+                                  protein_meshes, polarization, area_scale)
+    Cext = Cext_sensor + dCext
+    shift = grid_peak(wavelength, Cext) - grid_peak(wavelength, Cext_sensor)
+
+    return Cext, shift, indicator.max(), bool(indicator.max() <= max_indicator)
+
+
+def screen_placements(wavelength, Cext_sensor, diel, sensor, protein,
+                      placements, **kwargs):
+    '''Estimates the peak shift of many placements of the proteins (e.g. from
+       ensemble.sample_transforms) without solving them.
+
+    Arguments:
+    ----------
+    wavelength, Cext_sensor, diel: see peak_shift_estimate.
+    sensor     : (vertices, faces), mesh of the sensor.
+    protein    : (vertices, faces), mesh of the protein.
+    placements : list, each one a list of transforms (see
+                 assembly.build_assembly).
+    kwargs     : polarization, area_scale and max_indicator, see
+                 peak_shift_estimate.
+
+    Returns:
+    --------
+    shift      : array, estimated peak shift of each placement.
+    indicator  : array, validity indicator of each placement.
+    valid      : array of bool, placements whose estimate is valid.
+    '''
+
+    sensor_vertices = numpy.asarray(sensor[0], dtype=numpy.float64)
+    protein_vertices = numpy.asarray(protein[0], dtype=numpy.float64)
+    tree = surface_tree(*sensor)
+
+    shift, indicator, valid = [], [], []
+    for transforms in placements:
+        meshes = [(place_protein(sensor, protein_vertices,
+                                 t['distance'], t['direction'],
+                                 t.get('rotation'), tree), protein[1])
+                  for t in transforms]
+        _, s, ind, ok = peak_shift_estimate(wavelength, Cext_sensor, diel,
+                                            sensor_vertices, meshes, **kwargs)
+        shift.append(s)
+        indicator.append(ind)
+        valid.append(ok)
+
+    return numpy.array(shift), numpy.array(indicator), numpy.array(valid)
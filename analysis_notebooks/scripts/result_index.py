@@ -0,0 +1,264 @@
+"""
+Result index. Each run is stored as a folder of .npy arrays, and a single
+index.json keeps, for every run, its scalar results (times, iterations,
+Cext, file names, ...) and the name, shape and dtype of its arrays. Runs can
+be listed and queried by reading only the index; arrays are memory mapped when
+they are accessed. Unlike pickles, nothing is executed when loading and the
+files don't depend on the Python version.
+
+Usage, to migrate existing pickles:
+    python result_index.py ../../data/result_index ../../data/*.pickle
+    python result_index.py ../../paper/convergence_analysis/data/result_index \\
+        ../../paper/convergence_analysis/data/*_resultspickle
+"""
+
+import json
+import os
+import pickle
+import sys
+from argparse import ArgumentParser
+from collections.abc import Mapping
+
+import numpy
+
+INDEX_VERSION = 1
+INDEX_FILE = 'index.json'
+
+
+def load_index(root):
+    '''Loads the index of a result index folder.
+
+    Arguments:
+    ----------
+    root : str, path to the result index folder.
+
+    Returns:
+    --------
+    index: dictionary, with the 'version' of the format and the 'runs'. Each
+           run has its 'scalars' and the description of its 'arrays'.
+    '''
+
+    path = os.path.join(root, INDEX_FILE)
+    if not os.path.exists(path):
+        return {'version': INDEX_VERSION, 'runs': {}}
+
+    with open(path, 'r') as f:
+        index = json.load(f)
+
+    if index['version'] > INDEX_VERSION:
+        raise ValueError('{} has version {}, this module reads up to version '
+                         '{}'.format(path, index['version'], INDEX_VERSION))
+
+    return index
+
+
+def write_index(root, index):
+    '''Writes the index, replacing it atomically.
+    '''
+    path = os.path.join(root, INDEX_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def flatten(results, prefix=''):
+    '''Flattens nested dictionaries, joining the keys with '.'.
+    '''
+    flat = {}
+    for key, value in results.items():
+        name = prefix + str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def split_results(results):
+    '''Splits a results dictionary into scalars, that go to the index, and
+       arrays, that go to the payload. Lists and tuples are stored as arrays,
+       complex scalars as 0-d arrays.
+    '''
+    scalars, arrays = {}, {}
+    for key, value in flatten(results).items():
+        if isinstance(value, (str, bool)) or value is None:
+            scalars[key] = value
+            continue
+        value = numpy.asarray(value)
+        if value.ndim == 0 and value.dtype.kind in 'biuf':
+            scalars[key] = value.item()
+        else:
+            arrays[key] = value
+    return scalars, arrays
+
+
+def add_run(root, name, results, overwrite=False):
+    '''Adds a run to the result index.
+
+    Arguments:
+    ----------
+    root     : str, path to the result index folder, created if needed.
+    name     : str, name of the run, also the name of its payload folder.
+    results  : dictionary, results of the run (e.g. the results dictionary of
+               PyGBe). Nested dictionaries are flattened with '.'.
+    overwrite: bool, if False adding a run that exists raises a ValueError.
+    '''
+
+    index = load_index(root)
+    if name in index['runs'] and not overwrite:
+        raise ValueError('run {} already in {}'.format(name, root))
+
+    scalars, arrays = split_results(results)
+    os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    description = {}
+    for key, value in arrays.items():
+        file_name = os.path.join(name, key + '.npy')
+        tmp = os.path.join(root, file_name + '.tmp')
+        with open(tmp, 'wb') as f:
+            numpy.save(f, value, allow_pickle=False)
+        os.replace(tmp, os.path.join(root, file_name))
+        description[key] = {'file': file_name, 'shape': list(value.shape),
+                            'dtype': value.dtype.str}
+
+    index['version'] = INDEX_VERSION
+    index['runs'][name] = {'scalars': scalars, 'arrays': description}
+    write_index(root, index)
+
+
+def query_index(root, **query):
+    '''Lists the runs whose scalars match the query, reading only the index.
+
+    Arguments:
+    ----------
+    root   : str, path to the result index folder.
+    query  : values the scalars must have, e.g. total_elements=100164.
+             Floats are compared with numpy.isclose.
+
+    Returns:
+    --------
+    runs   : dictionary, maps the name of each matching run to its scalars.
+    '''
+
+    runs = {}
+    for name, run in load_index(root)['runs'].items():
+        scalars = run['scalars']
+        match = True
+        for key, value in query.items():
+            if key not in scalars:
+                match = False
+            elif isinstance(value, float) and isinstance(scalars[key], (int, float)):
+                match = numpy.isclose(scalars[key], value)
+            else:
+                match = scalars[key] == value
+            if not match:
+                break
+        if match:
+            runs[name] = scalars
+    return runs
+
+
+class Run(Mapping):
+    '''Results of a run. Scalars come from the index; arrays are loaded, memory
+       mapped by default, the first time they are accessed.
+
+    Arguments:
+    ----------
+    root: str, path to the result index folder.
+    name: str, name of the run.
+    mmap: bool, if True arrays are memory mapped (read only).
+    '''
+
+    def __init__(self, root, name, mmap=True, index=None):
+        if index is None:
+            index = load_index(root)
+        run = index['runs'][name]
+        self.root = root
+        self.name = name
+        self.mmap = mmap
+        self.scalars = run['scalars']
+        self.arrays = run['arrays']
+        self.loaded = {}
+
+    def __getitem__(self, key):
+        if key in self.scalars:
+            return self.scalars[key]
+        if key not in self.loaded:
+            path = os.path.join(self.root, self.arrays[key]['file'])
+            self.loaded[key] = numpy.load(path, allow_pickle=False,
+                                          mmap_mode='r' if self.mmap else None)
+        return self.loaded[key]
+
+    def __iter__(self):
+        yield from self.scalars
+        yield from self.arrays
+
+    def __len__(self):
+        return len(self.scalars) + len(self.arrays)
+
+
+def load_runs(root, mmap=True, **query):
+    '''Returns the runs that match the query (see query_index), as lazy Run
+       mappings.
+    '''
+    index = load_index(root)
+    return {name: Run(root, name, mmap, index)
+            for name in query_index(root, **query)}
+
+
+def migrate_pickle(root, pickle_file, name=None):
+    '''Adds the results in a pickle file to the result index. Only use it with
+       trusted files, unpickling can execute arbitrary code.
+
+    Arguments:
+    ----------
+    root       : str, path to the result index folder.
+    pickle_file: str, path to the pickle file.
+    name       : str, name of the run. Default is the file name without
+                 extension and without the 'resultspickle' suffix. A pickle
+                 that holds a dictionary of dictionaries (one per case, e.g.
+                 convergence_tests.pickle) becomes one run per case, named
+                 '<name>.<case>'.
+
+    Returns:
+    --------
+    names      : list, names of the runs added.
+    '''
+
+    with open(pickle_file, 'rb') as f:
+        results = pickle.load(f)
+
+    if name is None:
+        name = os.path.splitext(os.path.basename(pickle_file))[0]
+        if name.endswith('_resultspickle'):
+            name = name[:-len('_resultspickle')]
+
+    if results and all(isinstance(v, dict) for v in results.values()):
+        runs = {name + '.' + str(case): value for case, value in results.items()}
+    else:
+        runs = {name: results}
+
+    for run_name, run in runs.items():
+        add_run(root, run_name, run)
+
+    return list(runs)
+
+
+def main(argv=sys.argv):
+    '''
+    Migrates pickle files to a result index.
+    '''
+
+    parser = ArgumentParser(description='Migrate pickled results to a result index')
+    parser.add_argument('root', type=str, help="Result index folder")
+    parser.add_argument('pickles', nargs='+', help="Pickle files to migrate")
+    args = parser.parse_args(argv[1:])
+
+    for pickle_file in args.pickles:
+        names = migrate_pickle(args.root, pickle_file)
+        print('{} -> {}'.format(pickle_file, ', '.join(names)))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
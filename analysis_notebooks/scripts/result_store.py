@@ -0,0 +1,184 @@
+'''This file contains the result store. All the sweep results go into a single
+NumPy .npz table, one row per solved wavelength, with full float64 precision
+and the configuration of the run stored as columns. Results can then be
+queried by attributes instead of parsing file names.
+'''
+
+import os
+
+import numpy
+
+#Columns every row has. Other metadata given to append_results is added as
+#extra columns.
+COLUMNS = {'wavelength': numpy.nan,
+           'Cext'      : numpy.nan,
+           'case'      : '',
+           'mesh'      : '',
+           'radius'    : numpy.nan,
+           'distance'  : numpy.nan,
+           'elec_field': numpy.nan,
+           'material'  : '',
+           'unit'      : ''}
+
+#Columns that hold results. All the other columns, wavelength included, form
+#the key of a row: a row with the same key as a new one is replaced.
+VALUE_COLUMNS = ('Cext', 'Cext_reference')
+
+
+def load_store(store):
+    '''Loads all the columns of a result store.
+
+    Arguments:
+    ----------
+    store  : str, path to the .npz store.
+
+    Returns:
+    --------
+    columns: dictionary, maps each column name to its array. Empty if the
+             store does not exist yet.
+    '''
+
+    if not os.path.exists(store):
+        return {}
+
+    with numpy.load(store, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def fill_value(name, values):
+    '''Returns the value used for rows that don't have a column.
+    '''
+    if name in COLUMNS:
+        return COLUMNS[name]
+    return '' if values.dtype.kind == 'U' else numpy.nan
+
+
+def row_keys(columns, names, rows):
+    '''Returns the key of each row, the tuple of its values in the columns
+       names. NaN values compare equal, so rows without a float column (e.g.
+       radius) still match.
+    '''
+    values = []
+    for name in names:
+        column = columns[name][rows].astype(object)
+        if columns[name].dtype.kind in 'fc':
+            column[numpy.isnan(columns[name][rows])] = None
+        values.append(column.tolist())
+    return list(zip(*values))
+
+
+def append_results(store, wavelength, Cext, **metadata):
+    '''Appends the results of a sweep to the store. The metadata values are
+       stored in every row of the sweep. Rows of the store with the same
+       metadata and wavelength (see VALUE_COLUMNS) are replaced, so running a
+       sweep again, or resuming it, does not duplicate rows. The file is
+       replaced atomically, so an interrupted write never corrupts the store.
+
+    Arguments:
+    ----------
+    store     : str, path to the .npz store.
+    wavelength: array, wavelengths.
+    Cext      : array, cross extinction sections, same length as wavelength.
+    metadata  : keyword arguments, configuration of the sweep, e.g.
+                case='BSA_sensor_d=1', mesh='sensor_2K_R8nm', radius=8.,
+                distance=1., elec_field=-1, material='silver_JC72', unit='ang'.
+                Scalars or arrays of the same length as wavelength.
+
+    Returns:
+    --------
+    n_rows    : int, number of rows in the store after appending.
+    '''
+
+    wavelength = numpy.asarray(wavelength, dtype=numpy.float64)
+    rows = len(wavelength)
+
+    new = {'wavelength': wavelength,
+           'Cext': numpy.asarray(Cext, dtype=numpy.float64)}
+    for name, value in metadata.items():
+        new[name] = numpy.broadcast_to(numpy.asarray(value), (rows,))
+    for name, default in COLUMNS.items():
+        if name not in new:
+            new[name] = numpy.full(rows, default)
+
+    old = load_store(store)
+    old_rows = len(old['wavelength']) if old else 0
+
+    columns = {}
+    for name in list(old) + [name for name in new if name not in old]:
+        if name in old and name in new:
+            columns[name] = numpy.concatenate([old[name], new[name]])
+        elif name in old:
+            columns[name] = numpy.concatenate(
+                [old[name], numpy.full(rows, fill_value(name, old[name]))])
+        else:
+            columns[name] = numpy.concatenate(
+                [numpy.full(old_rows, fill_value(name, new[name])), new[name]])
+
+    if old_rows:
+        names = [name for name in columns if name not in VALUE_COLUMNS]
+        new_keys = set(row_keys(columns, names, slice(old_rows, None)))
+        keep = numpy.array([key not in new_keys for key in
+                            row_keys(columns, names, slice(0, old_rows))]
+                           + [True] * rows)
+        columns = {name: values[keep] for name, values in columns.items()}
+
+    tmp_store = store + '.{}.tmp'.format(os.getpid())
+    with open(tmp_store, 'wb') as f:
+        numpy.savez(f, **columns)
+    os.replace(tmp_store, store)
+
+    return len(columns['wavelength'])
+
+
+def query_results(store, **query):
+    '''Returns the rows of the store whose columns match the query, sorted by
+       wavelength.
+
+    Arguments:
+    ----------
+    store  : str, path to the .npz store.
+    query  : keyword arguments, column=value pairs that must all match.
+             Float columns are compared with numpy.isclose.
+
+    Returns:
+    --------
+    columns: dictionary, maps each column name to the array of matching rows.
+    '''
+
+    columns = load_store(store)
+    if not columns:
+        raise ValueError('Result store {} is empty'.format(store))
+
+    mask = numpy.ones(len(columns['wavelength']), dtype=bool)
+    for name, value in query.items():
+        if name not in columns:
+            raise KeyError('Column {} not in result store {}'.format(name, store))
+        if columns[name].dtype.kind in 'fc':
+            mask &= numpy.isclose(columns[name], value)
+        else:
+            mask &= columns[name] == value
+
+    order = numpy.argsort(columns['wavelength'][mask], kind='stable')
+
+    return {name: values[mask][order] for name, values in columns.items()}
+
+
+def import_text(store, file_name, **metadata):
+    '''Imports a (wavelength, Cext) text file written by numpy.savetxt into
+       the store, to migrate the existing results.
+
+    Arguments:
+    ----------
+    store    : str, path to the .npz store.
+    file_name: str, path to the text file.
+    metadata : keyword arguments, configuration of the sweep (see
+               append_results).
+
+    Returns:
+    --------
+    n_rows   : int, number of rows in the store after importing.
+    '''
+
+    wavelength, Cext = numpy.loadtxt(file_name, usecols=(0, 1), unpack=True)
+
+    return append_results(store, wavelength, Cext, **metadata)
@@ -0,0 +1,211 @@
+'''This file contains the spectral surrogate of the extinction cross section.
+A rational model of Cext(lambda) is fitted (AAA algorithm) to a handful of
+full BEM solves, checked against a few validation solves, and refined until
+it matches them within a tolerance. The model can then be evaluated at
+thousands of wavelengths instantly.
+'''
+
+import numpy
+from scipy.interpolate import PchipInterpolator
+
+from cext_wavelength_scanning import Cext_wave_scan
+from materials import diel_list
+
+
+def aaa_fit(x, f, tol=1e-10, mmax=None):
+    '''Fits a rational function to the data with the AAA algorithm (Nakatsukasa,
+       Sete and Trefethen 2018). The rational function is kept in barycentric
+       form.
+
+    Arguments:
+    ----------
+    x      : array, sample points (wavelengths).
+    f      : array, sample values (Cext).
+    tol    : float, relative tolerance of the fit at the sample points.
+    mmax   : int, maximum number of support points. Default is half of the
+             number of samples, so the fit does not just interpolate.
+
+    Returns:
+    --------
+    model  : tuple, (support points, values at the support points, weights).
+    '''
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    f = numpy.asarray(f, dtype=numpy.complex128)
+    if mmax is None:
+        mmax = max(len(x) // 2, 2)
+
+    mask = numpy.ones(len(x), dtype=bool)
+    r = numpy.full(len(x), numpy.mean(f))
+    support = []
+    weights = numpy.ones(1)
+
+    for m in range(min(mmax, len(x) - 1)):
+        j = numpy.argmax(numpy.abs(f - r) * mask)
+        support.append(j)
+        mask[j] = False
+
+        #Loewner matrix of the points that are not support points
+        C = 1 / (x[mask, numpy.newaxis] - x[numpy.newaxis, support])
+        A = (f[mask, numpy.newaxis] - f[numpy.newaxis, support]) * C
+        _, _, Vh = numpy.linalg.svd(A, full_matrices=False)
+        weights = Vh[-1].conj()
+
+        r = f.copy()
+        r[mask] = (C @ (weights * f[support])) / (C @ weights)
+
+        if numpy.max(numpy.abs(f - r)) <= tol * numpy.max(numpy.abs(f)):
+            break
+
+    return x[support], f[support], weights
+
+
+def surrogate_eval(model, wave):
+    '''Evaluates the surrogate model.
+
+    Arguments:
+    ----------
+    model: tuple, rational model returned by aaa_fit.
+    wave : float/array, wavelengths.
+
+    Returns:
+    --------
+    Cext : float/array, surrogate cross extinction section (real part).
+    '''
+
+    support, values, weights = model
+    wave = numpy.asarray(wave, dtype=numpy.float64)
+    w = numpy.atleast_1d(wave)
+
+    diff = w[:, numpy.newaxis] - support[numpy.newaxis, :]
+    exact = diff == 0
+    diff[exact] = 1.
+    C = 1 / diff
+    r = (C @ (weights * values)) / (C @ weights)
+
+    #at the support points the model is the data
+    rows, cols = numpy.nonzero(exact)
+    r[rows] = values[cols]
+
+    r = r.real
+    return r[0] if wave.ndim == 0 else r
+
+
+def fit_surrogate(solve, wave_start, wave_end, tol=1e-3, initial_points=8,
+                  validation_points=3, max_solves=60):
+    '''Builds the surrogate of Cext(lambda) in [wave_start, wave_end]. Each
+       round, validation wavelengths are placed in the intervals where the
+       rational model and a monotone cubic interpolation of the data disagree
+       the most. If the model matches the validation solves within tol it is
+       accepted, otherwise they become training data and the model is fitted
+       again.
+
+    Arguments:
+    ----------
+    solve            : function, takes an array of wavelengths and returns
+                       the array of Cext (full BEM solves).
+    wave_start       : float, start of the wavelength range.
+    wave_end         : float, end of the wavelength range.
+    tol              : float, tolerance of the error at the validation points,
+                       relative to the maximum of Cext.
+    initial_points   : int, number of solves of the first fit (Chebyshev
+                       points of the range).
+    validation_points: int, number of validation solves per round.
+    max_solves       : int, maximum total number of solves.
+
+    Returns:
+    --------
+    model            : tuple, rational model (see surrogate_eval).
+    error            : float, relative error at the last validation points.
+                       If max_solves is reached before the last fit is
+                       validated, the change of the model between the last
+                       two fits at the support points of the last one, or
+                       numpy.nan if there was a single fit.
+    wave_train       : array, wavelengths solved, sorted.
+    Cext_train       : array, Cext at wave_train.
+    '''
+
+    k = numpy.arange(initial_points)
+    wave_train = (wave_start + wave_end) / 2 - (wave_end - wave_start) / 2 \
+                 * numpy.cos(numpy.pi * k / (initial_points - 1))
+    Cext_train = numpy.asarray(solve(wave_train), dtype=numpy.float64)
+
+    previous = None
+    while True:
+        model = aaa_fit(wave_train, Cext_train)
+
+        mid = (wave_train[1:] + wave_train[:-1]) / 2
+        pchip = PchipInterpolator(wave_train, Cext_train)
+        disagreement = numpy.abs(surrogate_eval(model, mid) - pchip(mid))
+        disagreement[~numpy.isfinite(disagreement)] = numpy.inf
+        n_val = min(validation_points, len(mid), max_solves - len(wave_train))
+        if n_val <= 0:
+            break
+        wave_val = numpy.sort(mid[numpy.argsort(disagreement)[::-1][:n_val]])
+
+        Cext_val = numpy.asarray(solve(wave_val), dtype=numpy.float64)
+        scale = numpy.max(numpy.abs(numpy.concatenate([Cext_train, Cext_val])))
+        error = numpy.max(numpy.abs(surrogate_eval(model, wave_val) - Cext_val)) / scale
+        previous = model
+
+        wave_train = numpy.concatenate([wave_train, wave_val])
+        Cext_train = numpy.concatenate([Cext_train, Cext_val])
+        order = numpy.argsort(wave_train)
+        wave_train, Cext_train = wave_train[order], Cext_train[order]
+
+        if error <= tol:
+            break
+
+    if n_val <= 0:
+        #no validation budget left, estimate the error of the last fit with its
+        #change from the previous one at its support points
+        if previous is None:
+            error = numpy.nan
+        else:
+            support = model[0]
+            error = numpy.max(numpy.abs(surrogate_eval(model, support)
+                                        - surrogate_eval(previous, support))) \
+                    / numpy.max(numpy.abs(Cext_train))
+
+    return model, error, wave_train, Cext_train
+
+
+def Cext_surrogate(elec_field, wave_start, wave_end, materials, field_dict,
+                   example_folder_path, unit='nm', tol=1e-3, initial_points=8,
+                   validation_points=3, max_solves=60, workers=None,
+                   checkpoint=None):
+    '''Builds the surrogate of Cext(lambda) of a problem folder, solving it with
+       PyGBe only at the wavelengths fit_surrogate asks for. The dielectric
+       constants come from the material library.
+
+    Arguments:
+    ----------
+    elec_field         : float, electric field intensity.
+    wave_start         : float, start of the wavelength range.
+    wave_end           : float, end of the wavelength range.
+    materials          : list of str, material of each region (see
+                         materials.diel_list).
+    field_dict         : dictionary, config dictionary.
+    example_folder_path: str, path to the example folder.
+    unit               : str, unit of the wavelengths, 'nm' or 'ang'.
+    tol, initial_points, validation_points, max_solves: see fit_surrogate.
+    workers            : int, number of processes (see Cext_wave_scan).
+    checkpoint         : str, path to a checkpoint file (see Cext_wave_scan).
+
+    Returns:
+    --------
+    model, error, wave_train, Cext_train: see fit_surrogate. Evaluate the
+    model with surrogate_eval(model, wavelength).
+    '''
+
+    def solve(wave):
+        diel = diel_list(materials, wave, unit=unit)
+        _, Cext = Cext_wave_scan(elec_field, wave, diel, field_dict,
+                                 example_folder_path, workers=workers,
+                                 checkpoint=checkpoint)
+        return Cext
+
+    return fit_surrogate(solve, wave_start, wave_end, tol=tol,
+                         initial_points=initial_points,
+                         validation_points=validation_points,
+                         max_solves=max_solves)
@@ -0,0 +1,79 @@
+'''This file contains ready-made callbacks for the events that Cext_wave_scan
+fires before and after every solve: a JSON lines logger and a progress
+reporter with an estimate of the remaining time.
+'''
+
+import json
+import sys
+import time
+
+
+def jsonl_logger(log_file, keep_results=False):
+    '''Returns a callback that appends every event to a JSON lines file.
+
+    Arguments:
+    ----------
+    log_file    : str, path to the log file.
+    keep_results: bool, if True the full results dictionary of PyGBe is
+                  logged too (values that are not JSON serializable are
+                  written as strings).
+
+    Returns:
+    --------
+    callback    : function, to pass in the callbacks list of Cext_wave_scan.
+    '''
+
+    def callback(event):
+        entry = {'time': time.time()}
+        for key, value in event.items():
+            if key == 'results' and not keep_results:
+                continue
+            if key == 'error':
+                value = repr(value)
+            entry[key] = value
+
+        with open(log_file, 'a') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+    return callback
+
+
+def progress_reporter(stream=sys.stdout):
+    '''Returns a callback that prints, after every solve, how many solves are
+       done, the wall time and iterations of the last one and the estimated
+       time to finish the scan.
+
+    Arguments:
+    ----------
+    stream  : file, where the progress is printed.
+
+    Returns:
+    --------
+    callback: function, to pass in the callbacks list of Cext_wave_scan.
+    '''
+
+    state = {'start': None, 'done': 0}
+
+    def callback(event):
+        if state['start'] is None:
+            state['start'] = time.time()
+
+        if event['event'] == 'before_solve':
+            return
+
+        state['done'] += 1
+        elapsed = time.time() - state['start']
+        eta = elapsed / state['done'] * (event['total'] - state['done'])
+
+        if event['event'] == 'solve_failed':
+            last = 'failed: {!r}'.format(event['error'])
+        else:
+            last = '{:.1f} s, {} iterations'.format(event['wall_time'],
+                                                   event['iterations'])
+
+        print('[{}/{}] wavelength {} ({}), elapsed {:.0f} s, '
+              'ETA {:.0f} s'.format(state['done'], event['total'],
+                                    event['wavelength'], last, elapsed, eta),
+              file=stream, flush=True)
+
+    return callback
@@ -0,0 +1,10 @@
+'''The scripts import each other by module name, as when they are run from
+analysis_notebooks/scripts, so that folder is put first in the path of the
+tests.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '../scripts'))
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from acceleration import (ACCELERATION, TOLERANCE, accelerated_folder,
+                          acceleration_settings, write_param)
+from benchmark import check_accuracy
+
+
+def test_every_mode_has_a_tolerance():
+    assert set(TOLERANCE) == set(ACCELERATION)
+
+
+def test_write_param_changes_and_appends(tmp_path):
+    param = tmp_path / 'case.param'
+    param.write_text('Nk\t3\ntheta\t0.5\nREAL\tdouble\n')
+
+    write_param(str(param), str(tmp_path / 'new.param'),
+                acceleration_settings({'theta': 0.6, 'P': 8}))
+
+    assert (tmp_path / 'new.param').read_text().splitlines() == \
+        ['Nk\t3', 'theta\t0.6', 'REAL\tdouble', 'P\t8']
+
+
+def test_accelerated_folder_is_a_cached_shadow(tmp_path):
+    folder = tmp_path / 'case'
+    (folder / 'geometry').mkdir(parents=True)
+    (folder / 'case.param').write_text('theta\t0.5\n')
+    (folder / 'case.config').write_text('FILE\tgeometry/s\tdielectric_interface\n')
+
+    shadow = accelerated_folder(str(folder), 'treecode', str(tmp_path / 'cache'))
+
+    assert accelerated_folder(str(folder), 'treecode',
+                              str(tmp_path / 'cache')) == shadow
+    assert os.path.islink(os.path.join(shadow, 'case.config'))
+    assert 'theta\t0.6' in open(os.path.join(shadow, 'case.param')).read()
+    assert (folder / 'case.param').read_text() == 'theta\t0.5\n'
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        acceleration_settings('fmm')
+
+
+def test_check_accuracy():
+    reference = {'Cext': [100., 200.], 'wall_time': [4., 4.]}
+    record = {'Cext': [100.1, 201.], 'wall_time': [1., 1.]}
+
+    check = check_accuracy(reference, record, 5e-3)
+
+    assert check['rel_err'] == pytest.approx(5e-3)
+    assert check['speedup'] == pytest.approx(4.)
+    assert check['passed']
+    assert not check_accuracy(reference, record, 1e-3)['passed']
+    assert check['rss_ratio'] is None
+
+
+def test_check_accuracy_memory():
+    reference = {'Cext': [100.], 'wall_time': [4.], 'peak_rss_mb': 2000.}
+    record = {'Cext': [100.], 'wall_time': [2.], 'peak_rss_mb': 500.}
+
+    assert check_accuracy(reference, record, 1e-3)['rss_ratio'] == \
+        pytest.approx(0.25)
@@ -0,0 +1,77 @@
+import warnings
+
+import numpy
+import pytest
+
+from assembly import (place_protein, point_triangle_distance, surface_gap,
+                      surface_tree)
+
+
+def octahedron(radius=1.):
+    '''Coarsest closed mesh of a sphere, the worst case of a vertex to vertex
+       gap.
+    '''
+    vertices = radius * numpy.array([[1., 0, 0], [-1, 0, 0], [0, 1, 0],
+                                     [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+    faces = numpy.array([[0, 2, 4], [2, 1, 4], [1, 3, 4], [3, 0, 4],
+                         [2, 0, 5], [1, 2, 5], [3, 1, 5], [0, 3, 5]])
+    return vertices, faces
+
+
+def test_point_triangle_distance():
+    triangle = numpy.array([[[0., 0, 0], [1, 0, 0], [0, 1, 0]]])
+    points = numpy.array([[0.2, 0.2, 0.5],    #above the inside
+                          [2., 0, 0],         #beyond a corner
+                          [0.5, -1, 0]])      #beside an edge
+    distance = point_triangle_distance(points, numpy.repeat(triangle, 3, axis=0))
+    numpy.testing.assert_allclose(distance, [0.5, 1., 1.])
+
+
+def test_surface_gap_is_exact_on_coarse_meshes():
+    sensor = octahedron()
+    tree = surface_tree(*sensor)
+    #point above the center of a face, far from its corners
+    normal = numpy.ones(3) / numpy.sqrt(3)
+    point = (1/numpy.sqrt(3) + 0.1) * normal
+
+    gap = surface_gap(tree, point[numpy.newaxis])
+    vertex_gap = numpy.linalg.norm(sensor[0] - point, axis=1).min()
+
+    assert gap == pytest.approx(0.1)
+    assert vertex_gap > 0.5
+
+
+def test_surface_gap_matches_brute_force():
+    sensor = octahedron(5.)
+    tree = surface_tree(*sensor)
+    points = numpy.random.default_rng(0).normal(size=(200, 3)) * 4 + 6
+
+    triangles = tree['triangles']
+    i, j = numpy.divmod(numpy.arange(len(points) * len(triangles)),
+                        len(triangles))
+    exact = point_triangle_distance(points[i], triangles[j]).min()
+
+    assert surface_gap(tree, points) == pytest.approx(exact)
+    assert surface_gap(tree, points, upper_bound=exact / 2) == numpy.inf
+
+
+def test_place_protein_reaches_the_gap():
+    sensor = octahedron(10.)
+    protein = octahedron(2.)[0]
+    tree = surface_tree(*sensor)
+
+    vertices = place_protein(sensor, protein, 1.5, [1, 2, 3],
+                             rotation=([0, 1, 0], 20.), sensor_tree=tree)
+
+    assert surface_gap(tree, vertices) == pytest.approx(1.5, abs=1e-6)
+
+
+def test_place_protein_warns_when_not_converged():
+    sensor = octahedron(10.)
+    protein = octahedron(2.)[0]
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        place_protein(sensor, protein, 1.5, [1, 2, 3], max_iter=1)
+
+    assert any('gap' in str(w.message) for w in caught)
@@ -0,0 +1,56 @@
+import numpy
+
+from mesh_refinement import refine, undo_green
+
+
+def square_grid(n=4):
+    '''Square [0, n]^2 split in 2 n^2 right isosceles triangles.'''
+    x, y = numpy.meshgrid(numpy.arange(n + 1.), numpy.arange(n + 1.))
+    vertices = numpy.stack([x.ravel(), y.ravel(), numpy.zeros(x.size)], axis=1)
+    faces = []
+    for i in range(n):
+        for j in range(n):
+            a, b = i*(n + 1) + j, i*(n + 1) + j + 1
+            c, d = a + n + 1, b + n + 1
+            faces += [[a, b, d], [a, d, c]]
+    return vertices, numpy.array(faces)
+
+
+def min_angle(vertices, faces):
+    triangles = vertices[faces]
+    angles = []
+    for k in range(3):
+        u = triangles[:, (k+1) % 3] - triangles[:, k]
+        v = triangles[:, (k+2) % 3] - triangles[:, k]
+        cos = numpy.einsum('ij,ij->i', u, v) / (numpy.linalg.norm(u, axis=1)
+                                                * numpy.linalg.norm(v, axis=1))
+        angles.append(numpy.degrees(numpy.arccos(numpy.clip(cos, -1, 1))))
+    return numpy.min(angles)
+
+
+def test_min_angle_does_not_degrade_across_levels():
+    #marks that are not nested, so green triangles of one pass get a refined
+    #neighbour in the next. Bisecting them again would go down to ~8 degrees;
+    #with red-green the worst triangle is half a right isosceles one
+    rng = numpy.random.default_rng(1)
+    n = 4
+    vertices, faces = square_grid(n)
+    green = None
+    for level in range(6):
+        center = numpy.append(rng.uniform(0, n, size=2), 0.)
+        marked = numpy.linalg.norm(vertices[faces].mean(axis=1) - center,
+                                   axis=1) < 0.7
+        faces, marked, hanging = undo_green(faces, marked, green)
+        vertices, faces, green = refine(vertices, faces, marked, None, hanging)
+
+        assert min_angle(vertices, faces) > numpy.degrees(numpy.arctan(1/3)) - 1e-6
+        #conforming: every interior edge is shared by two triangles
+        edges = numpy.sort(numpy.concatenate([faces[:, [0, 1]], faces[:, [1, 2]],
+                                              faces[:, [2, 0]]]), axis=1)
+        _, count = numpy.unique(edges, axis=0, return_counts=True)
+        assert count.max() == 2
+        triangles = vertices[faces]
+        area = numpy.cross(triangles[:, 1] - triangles[:, 0],
+                           triangles[:, 2] - triangles[:, 0])[:, 2] / 2
+        assert area.min() > 0
+        numpy.testing.assert_allclose(area.sum(), n**2)
@@ -0,0 +1,23 @@
+from parameter_study import STUDIES, expand_study
+
+
+def test_orientation_folders_follow_the_repo_names():
+    combinations = expand_study(STUDIES['orientation'])
+
+    folders = [task[0] for _, task, _ in combinations]
+    references = {reference[0] for _, _, reference in combinations}
+    assert folders == ['BSA_sensorR80_2px_d=1_00', 'BSA_sensorR80_2py_d=1_00',
+                       'BSA_sensorR80_2pz_d=1_00']
+    assert references == {'BSA_sensorR80_d=infty'}
+
+
+def test_entries_per_axis_value():
+    radius = expand_study(STUDIES['radius'])
+    proteins = expand_study(STUDIES['proteins'])
+
+    assert [task[0] for _, task, _ in radius] == [
+        'BSA_sensorR80_2pz_d=1_00', 'BSA_sensorR100_2prot',
+        'BSA_sensorR125_2pz_d=1_00']
+    assert [task[2].count('BSA') for _, task, _ in proteins] == [2, 3, 4]
+    assert all(reference[2] == ('water_HQ72', 'silver_JC72')
+               for _, _, reference in proteins)
@@ -0,0 +1,69 @@
+import numpy
+
+from mesh_refinement import refine, sphere_projection
+from mie_reference import Cext_analytical, Cext_coated_analytical
+from perturbation import delta_Cext, sensor_field, volume_quadrature
+
+
+def sphere(levels=3):
+    '''Unit sphere from a refined octahedron, rescaled to the volume of the
+       sphere so that thin shells cut from it have the right volume.
+    '''
+    vertices = numpy.array([[1., 0, 0], [-1, 0, 0], [0, 1, 0],
+                            [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+    faces = numpy.array([[0, 2, 4], [2, 1, 4], [1, 3, 4], [3, 0, 4],
+                         [2, 0, 5], [1, 2, 5], [3, 1, 5], [0, 3, 5]])
+    project = sphere_projection(numpy.zeros(3), 1.)
+    for _ in range(levels):
+        vertices, faces, _ = refine(vertices, faces,
+                                 numpy.ones(len(faces), dtype=bool), project)
+
+    _, weights = volume_quadrature(vertices, faces)
+    return vertices * (4*numpy.pi/3 / weights.sum())**(1/3), faces
+
+
+def shell_cells(radius, thickness):
+    '''Shell around the sensor as closed prisms, one per triangle of the
+       sphere. Each prism is a separate protein, the way the quadrature
+       expects them: small and outside the sensor.
+    '''
+    vertices, faces = sphere()
+    prism = numpy.array([[0, 2, 1], [3, 4, 5], [0, 1, 4], [0, 4, 3],
+                         [1, 2, 5], [1, 5, 4], [2, 0, 3], [2, 3, 5]])
+    return [(numpy.vstack([radius*vertices[face],
+                           (radius + thickness)*vertices[face]]), prism)
+            for face in faces]
+
+
+def test_sensor_field_has_transverse_component():
+    #at 45 degrees from the polarization, beta = 1/2
+    point = numpy.array([[2., 0, 2]])
+    E = sensor_field(point, numpy.zeros(3), 1., 1., numpy.array([4.]),
+                     numpy.array([0., 0, 1]))
+
+    dipole = (1.5*numpy.array([1., 0, 1]) - [0, 0, 1]) / (2*numpy.sqrt(2))**3
+    assert E.shape == (1, 3, 1)
+    numpy.testing.assert_allclose(E[0, :, 0], [0, 0, 1] + 0.5*dipole)
+
+
+def test_delta_Cext_matches_coated_sphere():
+    #thin shell of low contrast, where the first order estimate holds, across
+    #the resonance of the sensor (diel_sensor = -2*diel_out)
+    radius, thickness = 10., 0.2
+    wavelength = numpy.array([350., 380, 400, 450, 500])
+    diel_out = 1.77
+    diel_sensor = numpy.array([-2+0.3j, -3.2+0.4j, -4+0.3j, -6+0.4j, -9+0.5j])
+    diel_protein = 1.01*diel_out
+
+    cells = shell_cells(radius, thickness)
+    diel = numpy.empty((len(wavelength), 2 + len(cells)), dtype=complex)
+    diel[:, 0], diel[:, 1], diel[:, 2:] = diel_out, diel_sensor, diel_protein
+
+    dCext, indicator = delta_Cext(wavelength, diel, numpy.zeros(3), radius,
+                                  cells)
+    exact = Cext_coated_analytical(radius, radius + thickness, wavelength,
+                                   diel_out, diel_protein, diel_sensor) \
+            - Cext_analytical(radius, wavelength, diel_out, diel_sensor)
+
+    numpy.testing.assert_allclose(dCext, exact, rtol=0.02)
+    assert indicator.max() < 0.01
@@ -0,0 +1,34 @@
+import numpy
+
+from spectral_surrogate import fit_surrogate, surrogate_eval
+
+
+def lorentzian(wave):
+    return 1 / ((wave - 380.)**2 + 4.)
+
+
+def test_fit_surrogate_matches_resonance():
+    model, error, wave_train, _ = fit_surrogate(lorentzian, 350., 420.,
+                                                tol=1e-6)
+
+    wave = numpy.linspace(350., 420., 701)
+    assert error <= 1e-6
+    numpy.testing.assert_allclose(surrogate_eval(model, wave), lorentzian(wave),
+                                  atol=1e-5*lorentzian(380.))
+    assert len(wave_train) < 60
+
+
+def test_error_estimate_without_validation_budget():
+    #the budget runs out after the first validation round, so the last fit
+    #is not validated and its error is estimated from the previous fit
+    _, error, wave_train, _ = fit_surrogate(lambda wave: numpy.sin(wave/3.),
+                                            0., 60., initial_points=8,
+                                            validation_points=3,
+                                            max_solves=11)
+
+    assert len(wave_train) == 11
+    assert numpy.isfinite(error) and error > 0
+
+    _, error, _, _ = fit_surrogate(lorentzian, 350., 420., initial_points=8,
+                                   max_solves=8)
+    assert numpy.isnan(error)
@@ -0,0 +1,107 @@
+'''This file contains functions to read the mesh files (.vert and .face). The
+text files are converted once into binary .npy files, float64 vertices and
+int32 zero-based faces, that are memory-mapped on the following reads.
+'''
+
+import os
+
+import numpy
+
+
+def binary_paths(mesh):
+    '''Returns the paths of the binary vertices and faces files of a mesh.
+    '''
+    return mesh + '.vert.npy', mesh + '.face.npy'
+
+
+def read_mesh_text(mesh):
+    '''Reads the mesh text files.
+
+    Arguments:
+    ----------
+    mesh    : str, path to the mesh files without the extension.
+
+    Returns:
+    --------
+    vertices: array (N, 3) of float64, coordinates of the vertices.
+    faces   : array (M, 3) of int32, zero-based indices of the vertices of
+              each triangle. Extra columns of the .face file are ignored.
+    '''
+
+    vertices = numpy.loadtxt(mesh + '.vert', dtype=numpy.float64, usecols=(0, 1, 2),
+                             ndmin=2)
+    faces = numpy.loadtxt(mesh + '.face', dtype=numpy.int32, usecols=(0, 1, 2),
+                          ndmin=2) - 1
+
+    return vertices, faces
+
+
+def binary_is_current(mesh):
+    '''Checks if the binary files of a mesh exist and are newer than the text
+       files.
+    '''
+    for text, binary in zip((mesh + '.vert', mesh + '.face'), binary_paths(mesh)):
+        if not os.path.exists(binary):
+            return False
+        if os.path.exists(text) and os.path.getmtime(text) > os.path.getmtime(binary):
+            return False
+    return True
+
+
+def convert_mesh(mesh):
+    '''Converts the mesh text files into binary .npy files, next to them.
+
+    Arguments:
+    ----------
+    mesh    : str, path to the mesh files without the extension.
+
+    Returns:
+    --------
+    vertices: array (N, 3) of float64, coordinates of the vertices.
+    faces   : array (M, 3) of int32, zero-based indices of the vertices.
+    '''
+
+    vertices, faces = read_mesh_text(mesh)
+
+    for array, path in zip((vertices, faces), binary_paths(mesh)):
+        tmp_path = path + '.{}.tmp'.format(os.getpid())
+        with open(tmp_path, 'wb') as f:
+            numpy.save(f, array)
+        os.replace(tmp_path, path)
+
+    return vertices, faces
+
+
+def read_mesh(mesh, mmap=True, convert=True):
+    '''Reads a mesh. If its binary files are up to date they are loaded
+       (memory-mapped by default, so no copy is made), otherwise the text
+       files are read and, if convert is True, converted for the next time.
+       If the binary files can not be written the text files are used.
+
+    Arguments:
+    ----------
+    mesh    : str, path to the mesh files without the extension.
+              e.g. 'mesh_files/sensor/sensor_32K_R8nm'
+    mmap    : bool, if True the binary files are memory-mapped read only.
+    convert : bool, if True the text files are converted to binary when the
+              binary files are missing or out of date.
+
+    Returns:
+    --------
+    vertices: array (N, 3) of float64, coordinates of the vertices.
+    faces   : array (M, 3) of int32, zero-based indices of the vertices.
+    '''
+
+    if binary_is_current(mesh):
+        mmap_mode = 'r' if mmap else None
+        vert_path, face_path = binary_paths(mesh)
+        return (numpy.load(vert_path, mmap_mode=mmap_mode),
+                numpy.load(face_path, mmap_mode=mmap_mode))
+
+    if convert:
+        try:
+            return convert_mesh(mesh)
+        except OSError:
+            pass
+
+    return read_mesh_text(mesh)
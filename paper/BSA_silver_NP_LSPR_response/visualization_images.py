@@ -1,211 +1,370 @@
 '''This file contains functions that help to produce the images of the proteins
-locations respect to the sensor. 
+locations respect to the sensor.
+
+All the views and formats are rendered in parallel processes, off screen. Each
+mesh is read once (see mesh_io), and can be decimated to a preview level of
+detail. An image is only rendered again when its content hash changes: the
+hash covers the mesh files, the view, the format and the level of detail, and
+the hashes of the images in the figures folder are kept in a manifest.
+
+Usage:
+    python visualization_images.py                  #notebook png and paper pdf
+    python visualization_images.py -d 4 -f png      #quick previews
 '''
 
-import numpy
-from matplotlib import pyplot, rcParams
-from mpl_toolkits.mplot3d import Axes3D
+import hashlib
+import json
 import os
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy
 
-def read_data_plot(sensor, prt_one, prt_two, elev, azim, prot_color,
-                    file_name=None, file_ext=None, fig_size=None):
-    '''Reads the mesh files (.vert and .face) necessary to plot the 
-    sensor-proteins display and save them as png. 
+from mesh_io import read_mesh
+
+FIGURES_PATH = 'figures'
+MANIFEST = 'render_manifest.json'
+
+#image name: meshes of the sensor and the proteins, view and protein color
+VIEWS = {
+    '2prot_1nm_z_R8nm': {
+        'sensor': 'mesh_files/sensor/sensor_32K_R8nm',
+        'proteins': ['mesh_files/BSA_sensor_2pz_d=1_00/bsa_d1_R8+1nm_z',
+                     'mesh_files/BSA_sensor_2pz_d=1_00/bsa_d1_R8+1nm_-z'],
+        'elev': 0, 'azim': -90, 'prot_color': 'red'},
+    '2prot_1nm_x_R8nm': {
+        'sensor': 'mesh_files/sensor/sensor_32K_R8nm',
+        'proteins': ['mesh_files/BSA_sensor_2px_d=1_00/bsa_d1_R8+1nm_x',
+                     'mesh_files/BSA_sensor_2px_d=1_00/bsa_d1_R8+1nm_-x'],
+        'elev': 0, 'azim': -90, 'prot_color': 'blue'},
+    '2prot_1nm_y_R8nm': {
+        'sensor': 'mesh_files/sensor/sensor_32K_R8nm',
+        'proteins': ['mesh_files/BSA_sensor_2py_d=1_00/bsa_d1_R8+1nm_y',
+                     'mesh_files/BSA_sensor_2py_d=1_00/bsa_d1_R8+1nm_-y'],
+        'elev': 0, 'azim': -180, 'prot_color': 'green'},
+}
+
+#file extension: figure settings (png for the notebook, pdf for the paper)
+FORMATS = {'png': {'fig_size': (9, 9), 'fs': 10},
+           'pdf': {'fig_size': (9, 9), 'fs': 10}}
+
+#meshes of the worker processes, set once per process by set_meshes
+_meshes = {}
+
+
+def decimate(vertices, faces, cell):
+    '''Reduces the level of detail of a mesh by vertex clustering: vertices
+       in the same cube of side cell are merged into their mean, and the
+       triangles that collapse or repeat are removed.
 
     Arguments:
-    ---------
-    sensor : str, path to the sensor mesh files without the extention. 
-    prt_one: str, path to the protein one mesh files without the extention. 
-    prt_two: str, path to the protein two files without the extention.
+    ----------
+    vertices: array (N, 3), coordinates of the vertices.
+    faces   : array (M, 3), zero-based indices of the vertices.
+    cell    : float, side of the cubes, in the units of the mesh.
+
+    Returns:
+    --------
+    vertices, faces: decimated mesh.
+    '''
 
-    Example:
-    If the location of the mesh files, sensor.vert and sensor.face, is mesh_files/
-    then:
-    sensor = 'mesh_files/sensor' 
+    keys = numpy.floor(numpy.asarray(vertices) / cell).astype(numpy.int64)
+    _, cluster, counts = numpy.unique(keys, axis=0, return_inverse=True,
+                                      return_counts=True)
+    cluster = cluster.ravel()
 
-    elev  : float, set the elevation of the axes (elevation angle in the z plane). 
-    azim  : float, set the azimuth of the axes (azimuth angle in the x,y plane).    
-    '''
+    new_vertices = numpy.zeros((len(counts), 3))
+    numpy.add.at(new_vertices, cluster, vertices)
+    new_vertices /= counts[:, None]
 
-    #load sensor
-    xs, ys, zs = numpy.loadtxt(fname=sensor+'.vert', unpack=True)
-    face_s = numpy.loadtxt(fname=sensor+'.face') 
-    face_sensor = face_s[:][:] - 1
+    new_faces = cluster[faces]
+    a, b, c = new_faces.T
+    new_faces = new_faces[(a != b) & (b != c) & (c != a)]
+    _, index = numpy.unique(numpy.sort(new_faces, axis=1), axis=0,
+                            return_index=True)
 
-    #load protein 1
-    xp1, yp1, zp1 = numpy.loadtxt(fname=prt_one+'.vert', unpack=True) 
-    f_11, f_21, f_31, g1, h1 = numpy.loadtxt(fname=prt_one+'.face', unpack=True)
+    return new_vertices, new_faces[numpy.sort(index)]
 
-    face_prt1 = numpy.array(list(zip(f_11, f_21, f_31)))
-    face_protein_1 = face_prt1[:][:] - 1
 
-    #load protein 2
-    xp2, yp2, zp2 = numpy.loadtxt(fname=prt_two+'.vert', unpack=True)  
-    f_12, f_22, f_32, g2, h2 = numpy.loadtxt(fname=prt_two+'.face', unpack=True)
+def file_hash(mesh):
+    '''Returns the sha1 of the text files (.vert and .face) of a mesh.
+    '''
+    sha = hashlib.sha1()
+    for path in (mesh + '.vert', mesh + '.face'):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
 
-    face_prt2 = numpy.array(list(zip(f_12, f_22, f_32)))
-    face_protein_2 = face_prt2[:][:] - 1
 
-    ### Plot image ###
+def render_hash(view, file_ext, cell, mesh_hashes):
+    '''Returns the content hash of an image: its meshes, view, format and
+       level of detail.
+    '''
+    content = {'meshes': [mesh_hashes[m] for m in [view['sensor']]
+                          + view['proteins']],
+               'view': {key: view[key] for key in ('elev', 'azim', 'prot_color')},
+               'format': dict(FORMATS[file_ext], file_ext=file_ext),
+               'cell': cell}
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
 
-    pyplot.switch_backend('agg')         # We changed the backend to not generate the interactive image  
-    
-    fig = pyplot.figure(figsize=fig_size)
-    #fig.set_figheight(fig_size[1])
-    #fig.set_figwidth(fig_size[0])
 
-    ax = fig.gca(projection='3d')
+def plot_view(sensor, proteins, elev, azim, prot_color, file_path=None,
+              file_ext=None, fig_size=None, fs=10):
+    '''Plots the sensor-proteins display and saves it.
 
+    Arguments:
+    ----------
+    sensor    : (vertices, faces), mesh of the sensor.
+    proteins  : list of (vertices, faces), meshes of the proteins.
+    elev      : float, set the elevation of the axes (elevation angle in the z
+                plane).
+    azim      : float, set the azimuth of the axes (azimuth angle in the x,y
+                plane).
+    prot_color: str, color of the edges of the proteins.
+    file_path : str, path of the image, without extension.
+    file_ext  : str, format of the image (png, pdf).
+    fig_size  : (float, float), size of the figure in inches.
+    fs        : float, font size.
+    '''
 
-    ax.plot_trisurf(xs, ys, zs, triangles=face_sensor, linewidth=0.1,
-                     edgecolor="black", color="white", alpha=0.2)
-    ax.plot_trisurf(xp1, yp1, zp1, triangles=face_protein_1, linewidth=0.1,
-                     edgecolor=prot_color, color="white", alpha=0.1 )
-    ax.plot_trisurf(xp2, yp2, zp2, triangles=face_protein_2, linewidth=0.1,
-                     edgecolor=prot_color, color="white", alpha=0.1 )
+    #off screen backend, chosen before pyplot is imported
+    import matplotlib
+    matplotlib.use('agg')
+    from matplotlib import pyplot
 
-    ax.set_xlabel('X [$\AA$]')
-    ax.set_ylabel('Y [$\AA$]')
-    ax.set_zlabel('Z [$\AA$]')
+    with pyplot.rc_context({'font.family': 'serif', 'font.size': fs}):
+        fig = pyplot.figure(figsize=fig_size)
+        ax = fig.add_subplot(projection='3d')
 
-    ax.xaxis.labelpad = 8
-    ax.yaxis.labelpad = 8
-    ax.zaxis.labelpad = 8
+        vs, face_sensor = sensor
+        ax.plot_trisurf(vs[:, 0], vs[:, 1], vs[:, 2], triangles=face_sensor,
+                        linewidth=0.1, edgecolor="black", color="white",
+                        alpha=0.2)
+        for vp, face_protein in proteins:
+            ax.plot_trisurf(vp[:, 0], vp[:, 1], vp[:, 2],
+                            triangles=face_protein, linewidth=0.1,
+                            edgecolor=prot_color, color="white", alpha=0.1)
 
-    arrayOfTicks = numpy.linspace(-200, 200, 11)
+        ax.set_xlabel(r'X [$\AA$]')
+        ax.set_ylabel(r'Y [$\AA$]')
+        ax.set_zlabel(r'Z [$\AA$]')
 
-    ax.xaxis.pane.fill = False
-    ax.yaxis.pane.fill = False
-    ax.zaxis.pane.fill = False
+        ax.xaxis.labelpad = 8
+        ax.yaxis.labelpad = 8
+        ax.zaxis.labelpad = 8
 
-    #ax.xaxis._axinfo["grid"].update({"linewidth":0.1, "color" : '0.7'})
-    #ax.yaxis._axinfo["grid"].update({"linewidth":0.1, "color" : '0.7'})
-    #ax.zaxis._axinfo["grid"].update({"linewidth":0.1, "color" : '0.7'})
-    
-    ax.grid(False)
-    
-    ax.w_xaxis.set_ticks(arrayOfTicks) 
-    ax.w_yaxis.set_ticks(arrayOfTicks) 
-    ax.w_zaxis.set_ticks(arrayOfTicks) 
+        arrayOfTicks = numpy.linspace(-200, 200, 11)
 
-    ilim = arrayOfTicks.min()
-    slim = arrayOfTicks.max()
+        ax.xaxis.pane.fill = False
+        ax.yaxis.pane.fill = False
+        ax.zaxis.pane.fill = False
 
-    ax.set_xlim3d(ilim, slim)
-    ax.set_ylim3d(ilim, slim)
-    ax.set_zlim3d(ilim, slim)
+        ax.grid(False)
 
-    ax.tick_params(pad=6)
-    pyplot.xticks(rotation=30)
-    pyplot.yticks(rotation=30)
+        ax.xaxis.set_ticks(arrayOfTicks)
+        ax.yaxis.set_ticks(arrayOfTicks)
+        ax.zaxis.set_ticks(arrayOfTicks)
 
-    #pyplot.tight_layout()
+        ilim = arrayOfTicks.min()
+        slim = arrayOfTicks.max()
 
-    if (azim==-90):
-        ax.w_yaxis.set_ticklabels([])
-        ax.set_ylabel('')
+        ax.set_xlim3d(ilim, slim)
+        ax.set_ylim3d(ilim, slim)
+        ax.set_zlim3d(ilim, slim)
 
-    if (azim==-180):
-        ax.w_xaxis.set_ticklabels([])
-        ax.set_xlabel('')
+        ax.tick_params(pad=6)
+        pyplot.xticks(rotation=30)
+        pyplot.yticks(rotation=30)
 
+        if (azim==-90):
+            ax.yaxis.set_ticklabels([])
+            ax.set_ylabel('')
 
-    ax.view_init(elev, azim)
+        if (azim==-180):
+            ax.xaxis.set_ticklabels([])
+            ax.set_xlabel('')
 
-    if (file_name and file_ext):
-        fig.savefig('figures/'+file_name+'.'+file_ext, bbox_inches='tight',
-                    format=file_ext, pad_inches=-0.75)
+        ax.view_init(elev, azim)
 
-def file_exist(files_list):
-    '''Checks if images files exist
-    '''
-    status = list()
-    for file in files_list:
-        if os.path.exists('figures/'+file):
-            status.append(True)
-        else:
-            status.append(False)
+        if (file_path and file_ext):
+            #write aside and move in place, so a half written image is never used
+            tmp_path = '{}.{}.{}.tmp'.format(file_path, file_ext, os.getpid())
+            fig.savefig(tmp_path, bbox_inches='tight', format=file_ext,
+                        pad_inches=-0.75)
+            os.replace(tmp_path, file_path + '.' + file_ext)
 
-    status = all(status)
+        pyplot.close(fig)
 
-    return status
 
-def main(paper=False):
-    ''' Generates all the png for sphere-BSA visualizations.
-    '''
+def read_data_plot(sensor, prt_one, prt_two, elev, azim, prot_color,
+                    file_name=None, file_ext=None, fig_size=None):
+    '''Reads the mesh files (.vert and .face) necessary to plot the
+    sensor-proteins display and save them in figures/.
 
-    if paper:
-        file_ext = 'pdf'
-        fig_size = (9, 9)
-        fs = 10
-    else:
-        file_ext = 'png'
-        fig_size = (9, 9)
-        fs = 10
+    Arguments:
+    ---------
+    sensor : str, path to the sensor mesh files without the extention.
+    prt_one: str, path to the protein one mesh files without the extention.
+    prt_two: str, path to the protein two files without the extention.
 
+    Example:
+    If the location of the mesh files, sensor.vert and sensor.face, is mesh_files/
+    then:
+    sensor = 'mesh_files/sensor'
 
-    rcParams['font.family'] = 'serif'
-    rcParams['font.size'] = fs
-    
+    elev  : float, set the elevation of the axes (elevation angle in the z plane).
+    azim  : float, set the azimuth of the axes (azimuth angle in the x,y plane).
+    '''
 
-    #Case of 2 proteins in z
-    sensor = 'mesh_files/sensor/sensor_2K_R8nm'
-    prt_1z = 'mesh_files/BSA_sensor_2pz_d=1_00/bsa_d0.3_R8+1nm_z'
-    prt_2z = 'mesh_files/BSA_sensor_2pz_d=1_00/bsa_d0.3_R8+1nm_-z'
+    file_path = os.path.join(FIGURES_PATH, file_name) if file_name else None
+    plot_view(read_mesh(sensor), [read_mesh(prt_one), read_mesh(prt_two)],
+              elev, azim, prot_color, file_path, file_ext, fig_size)
 
 
-    read_data_plot(sensor, prt_1z, prt_2z, elev=0, azim=-90,
-                                        prot_color='red',
-                                        file_name='2prot_1nm_z_R8nm',
-                                        file_ext=file_ext,
-                                        fig_size=fig_size)
-    
-    #Case of 2 proteins in x
-    prt_1x = 'mesh_files/BSA_sensor_2px_d=1_00/bsa_d0.3_R8+1nm_x'
-    prt_2x = 'mesh_files/BSA_sensor_2px_d=1_00/bsa_d0.3_R8+1nm_-x'
+def set_meshes(meshes):
+    '''Initializer of the worker processes, keeps the meshes read by
+       render_all so each one is sent once per process, not once per image.
+    '''
+    _meshes.update(meshes)
 
 
-    read_data_plot(sensor, prt_1x, prt_2x, elev=0, azim=-90,
-                                        prot_color='blue',
-                                        file_name='2prot_1nm_x_R8nm',
-                                        file_ext=file_ext,
-                                        fig_size=fig_size)
-    #Case of 2 proteins in y
-    prt_1y = 'mesh_files/BSA_sensor_2py_d=1_00/bsa_d0.3_R8+1nm_y'
-    prt_2y = 'mesh_files/BSA_sensor_2py_d=1_00/bsa_d0.3_R8+1nm_-y'
+def render_image(name, view, file_ext, file_path):
+    '''Renders one view in one format with the meshes of the worker.
+    '''
+    plot_view(_meshes[view['sensor']], [_meshes[p] for p in view['proteins']],
+              view['elev'], view['azim'], view['prot_color'], file_path,
+              file_ext, **FORMATS[file_ext])
+    return name, file_ext
 
 
-    read_data_plot(sensor, prt_1y, prt_2y, elev=0, azim=-180,
-                                        prot_color='green',
-                                        file_name='2prot_1nm_y_R8nm',
-                                        file_ext=file_ext,
-                                        fig_size=fig_size)
-    
+def load_manifest(figures_path):
+    '''Returns the content hashes of the images of a figures folder.
+    '''
+    path = os.path.join(figures_path, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
 
 
+def write_manifest(figures_path, manifest):
+    '''Writes the content hashes of the images of a figures folder.
+    '''
+    path = os.path.join(figures_path, MANIFEST)
+    tmp_path = path + '.{}.tmp'.format(os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
 
-if __name__ == "__main__":
 
-    files_nb = ['2prot_1nm_z_R8nm.png', '2prot_1nm_x_R8nm.png', '2prot_1nm_y_R8nm.png']
-    files_paper =['2prot_1nm_z_R8nm.pdf', '2prot_1nm_x_R8nm.pdf', '2prot_1nm_y_R8nm.pdf']
+def render_all(views=VIEWS, formats=('png', 'pdf'), cell=None, workers=None,
+               force=False, figures_path=FIGURES_PATH):
+    '''Renders the images of several views and formats in parallel, skipping
+       the ones that are up to date.
 
-    status_nb = file_exist(files_nb)
-    status_paper = file_exist(files_paper)
+    Arguments:
+    ----------
+    views       : dictionary, image name: view (see VIEWS).
+    formats     : list of str, extensions of the images (keys of FORMATS).
+    cell        : float, cell size of the decimation (see decimate), in
+                  Angstrom, None to use the full meshes. Decimated images get
+                  the suffix _preview.
+    workers     : int, number of processes.
+    force       : bool, if True all the images are rendered again.
+    figures_path: str, folder of the images.
+
+    Returns:
+    --------
+    rendered    : list of str, files rendered.
+    skipped     : list of str, files that were up to date.
+    '''
 
-    
-    if status_nb == False: 
-        print('This can take couple of minutes, please wait while images for '
-            'notebook report are produced.')
-        main()
-    
-    if status_paper == False:
-        print('This can take couple of minutes, please wait while images for '
-            'paper are produced.')
-        main(paper=True)
+    os.makedirs(figures_path, exist_ok=True)
+    manifest = load_manifest(figures_path)
+    suffix = '_preview' if cell else ''
+
+    mesh_hashes = {}
+    tasks, skipped = [], []
+    for name, view in views.items():
+        for mesh in [view['sensor']] + view['proteins']:
+            if mesh not in mesh_hashes:
+                mesh_hashes[mesh] = file_hash(mesh)
+        for file_ext in formats:
+            file_name = name + suffix + '.' + file_ext
+            key = render_hash(view, file_ext, cell, mesh_hashes)
+            if (not force and manifest.get(file_name) == key
+                    and os.path.exists(os.path.join(figures_path, file_name))):
+                skipped.append(file_name)
+            else:
+                tasks.append((name, file_ext, file_name, key))
+
+    if not tasks:
+        return [], skipped
+
+    #read (and decimate) each mesh once, only the ones that are needed
+    meshes = {}
+    for name, _, _, _ in tasks:
+        for mesh in [views[name]['sensor']] + views[name]['proteins']:
+            if mesh not in meshes:
+                vertices, faces = read_mesh(mesh)
+                if cell:
+                    vertices, faces = decimate(vertices, faces, cell)
+                meshes[mesh] = (numpy.asarray(vertices), numpy.asarray(faces))
+
+    rendered = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_meshes,
+                             initargs=(meshes,)) as pool:
+        futures = {pool.submit(render_image, name, views[name], file_ext,
+                               os.path.join(figures_path, name + suffix)):
+                   (file_name, key)
+                   for name, file_ext, file_name, key in tasks}
+        for future, (file_name, key) in futures.items():
+            future.result()
+            manifest[file_name] = key
+            rendered.append(file_name)
+
+    write_manifest(figures_path, manifest)
+
+    return rendered, skipped
+
+
+def main(argv=sys.argv):
+    ''' Generates the images of the sphere-BSA visualizations that are out of
+    date, png for the notebook and pdf for the paper.
+    '''
 
-    elif (status_nb and status_paper) == True:
-        print('Visualizations for notebook and paper already exist! If you want' 
-        'to generate them again, please delete the existing ones.')
+    parser = ArgumentParser(description='Render the sensor-proteins images')
+    parser.add_argument('-f',
+                        '--formats',
+                        nargs='+',
+                        choices=sorted(FORMATS),
+                        default=['png', 'pdf'],
+                        help="Formats of the images")
+    parser.add_argument('-d',
+                        '--decimate',
+                        type=float,
+                        default=None,
+                        help="Cell size of the preview decimation in Angstrom")
+    parser.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        default=None,
+                        help="Number of processes")
+    parser.add_argument('--force',
+                        action='store_true',
+                        help="Render all the images again")
+    args = parser.parse_args(argv[1:])
+
+    rendered, skipped = render_all(formats=args.formats, cell=args.decimate,
+                                   workers=args.workers, force=args.force)
+
+    for file_name in rendered:
+        print('rendered {}'.format(file_name))
+    if skipped:
+        print('{} images up to date: {}'.format(len(skipped), ', '.join(skipped)))
 
 
+if __name__ == "__main__":
+    main(sys.argv)
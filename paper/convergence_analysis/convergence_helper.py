@@ -1,10 +1,12 @@
 '''This file contains functions that help to analyze and plot data related
-to the convergence analysis.
+to the convergence analysis. The plots are in convergence_plots.
 '''
 
+import importlib
+import json
+import os
 import numpy
 import pickle
-from matplotlib import pyplot, rcParams
 
 def pickleload(pickle_file):
     '''Loads a pickle file and assins it to a variable.
@@ -13,6 +15,15 @@ def pickleload(pickle_file):
         dict_res = pickle.load(f)
     return dict_res
 
+def indexload(index_path, run):
+    '''Loads the scalar results of a run from a result index (see
+    analysis_notebooks/scripts/result_index.py), reading only its index.json,
+    e.g. indexload('data/result_index', '2K')['Cext_0'].
+    '''
+    with open(os.path.join(index_path, 'index.json'), 'r') as f:
+        index = json.load(f)
+    return index['runs'][run]['scalars']
+
 def ord_convergence(array, rate):
     '''Computes the order of convergence given 3 scalar outputs of 3 different
     mesh refinments, saved in an array. The rate is how much the mesh is
@@ -74,53 +85,14 @@ def perc_error(Cext, rich_ext):
     
     return rel_err, perc_err
 
-def plot_sph_complex_convergence(N, error, file_name=None, file_ext=None, paper=False):
-
-    if paper:
-        file_ext = 'pdf'
-        pyplot.switch_backend('agg')
-        fig = pyplot.figure(figsize=(3, 2))
-        ms = 5
-        lw = 1
-        fs = 10
-    else:
-        pyplot.figure(figsize=(6, 4))
-        ms = 10
-        lw = 2
-        fs = 12
-
-    rcParams['font.family'] = 'serif'
-    rcParams['font.size'] = fs
-    rcParams['xtick.top'] = True
-    rcParams['ytick.right'] = True
-    rcParams['axes.linewidth'] = 1
-
-    asymp = N[-3]*error[-3]/N
-
-    pyplot.loglog(N, error, ls='',marker='o', c='k', mew=1, mfc='w', ms=ms, label='BSA_sensor')
-    pyplot.loglog(N, asymp, c='k', marker='None', ls=':', lw=lw, label=None)
-
 
-    loc = (3*N[-2]+N[-1])/4
-
-    tex_loc = numpy.array((loc,N[-3]*error[-3]/loc))
-
-    
-    pyplot.text(tex_loc[0], tex_loc[1],'N$^{-1}$', fontsize=fs,
-                rotation=-35,rotation_mode='anchor')
-    
-    pyplot.xlabel('N')
-    pyplot.ylabel('Relative error')
-    pyplot.tick_params(axis='both', length=10, width=0.8, which='major', direction='in')
-    pyplot.tick_params(axis='both', length=5, width=0.8, which='minor', direction='in')
-    pyplot.ylim(1e-3,1)
-    pyplot.xlim(1e2,1e5)
-    pyplot.legend(loc='upper right', fontsize=fs, numpoints=1, handlelength=0.1).get_frame().set_lw(0.3)
-    pyplot.grid(True, which="both")
-    
-    if (file_name and file_ext):
-        #fig.subplots_adjust(left=0.235, bottom=0.25, right=0.965, top=0.95)
-        fig.savefig(file_name+'.'+file_ext, format=file_ext, dpi=80, bbox_inches='tight', pad_inches=0.04)
-
-    if paper :
-        pyplot.close(fig)
+def __getattr__(name):
+    '''Plots live in convergence_plots and are imported on first use, so
+       importing this module does not load matplotlib.
+    '''
+    if name in ('plot_sph_complex_convergence',):
+        plots = importlib.import_module(
+            (__package__ + '.' if __package__ else '') + 'convergence_plots')
+        return getattr(plots, name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__,
+                                                                   name))